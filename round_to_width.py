@@ -7,6 +7,11 @@ Ex:
 round_to_width(1234,3) -> '1e3'
 round_to_width(3.1415,3) -> '3.1'
 round_to_width(-3.1415,3) -> '-3 '
+round_to_width_array does the same for a whole list or NumPy array of
+numbers at once, which is much faster when there are lots of them,
+make_formatter is faster for lots of numbers one at a time, and
+format_table and write_table make fixed width tables of any size (like
+from a CSV file) with a column's worth of options for each column.
 
 It's also Python 2.7 compatible, and all fits in one file that can
 be copy-pasted into a terminal, so it works anywhere.
@@ -90,48 +95,97 @@ def _round_to_n(x, n, leading_zero=False):
         out, status = _round_to_n(-x, n-1, leading_zero)
         status = status if status == _OK else _NEG_OF
         return ('-' + out, status)
-    if x <= float('0.5e-' + '9'*(n-3)):
-        return ('0', _OK)
-    if x < float('1.5e-' + '9'*(n-3)):
-        return ('1e-' + '9'*(n-3), _OK)
+    table = _table(n)
+    return _round_positive(x, n, _regime(x, table), table)
+
+# _round_to_n's constants for each width n from 4 to 24, worked out the first
+# time they're needed instead of on every call.
+_TABLES = {}
+
+def _table(n):
+    # (at most this rounds to '0', less than this rounds to the next string,
+    # thresholds, less than this fits with an exponent, the saturated value)
+    # where a number less than thresholds[i] (and not an earlier one) has i
+    # digits before the decimal point.
+    if n not in _TABLES:
+        threshold_str = '9'*n + '5'
+        thresholds = [float(threshold_str[:i] + '.' + threshold_str[i:]) for i in range(n+1)]
+        _TABLES[n] = (float('0.5e-' + '9'*(n-3)), float('1.5e-' + '9'*(n-3)),
+                      '1e-' + '9'*(n-3), thresholds, float('9.5e' + '9'*(n-2)),
+                      float('9e' + '9'*(n-2)))
+    return _TABLES[n]
+
+# The regimes of a number that's not negative, for _round_positive:
+# 0: rounds to '0'
+# 1: rounds to '1e-99...'
+# 2: small exponent, like '1.5e-4'
+# 3+i for i from 0 to n: decimal with i digits before the decimal point
+#    (i == n is an integer)
+# n+4: large exponent, like '1.5e12'
+# n+5: overflow
+def _regime(x, table):
+    zero, one, one_str, thresholds, big, saturated = table
+    if x <= zero:
+        return 0
+    if x < one:
+        return 1
     if x < .001:
-        mantissa, exponent = format(x, '.18e').split('e')
-        exponent = 'e' + str(int(exponent))
-        mantissa = str(round(float(mantissa), max(0,n-len(exponent)-2)))
-        mantissa = mantissa[:n-len(exponent)]
-        if mantissa[-1] == '.':
-            mantissa = mantissa[:-1]
-        return (mantissa + exponent, _OK)
-    threshold_str = '9'*n + '5'
-    for i in range(n+1):
-        threshold = float(threshold_str[:i] + '.' + threshold_str[i:])
-        if x < threshold:
-            out = ''
-            if i == 0:
-                if not leading_zero:
-                    out = str(round(x,n-i-1))[1:]
-                else:
-                    out = str(round(x,n-i-2))
-            if i == n:
-                out = str(int(round(x)))[:n]
-            else:
-                out = str(round(x,n-i-1))[:n]
-                if out[-1] == '.':
-                    #out = str(round(x,n-i-1))[:n-1]
-                    out = out[:-1]
-            out = out[:n]
-            if out[-1] == '.':
-                out = out[:-1]
-            return (out, _OK)
-    if x < float('9.5e' + '9'*(n-2)):
-        mantissa, exponent = format(x, '.17e').split('e')
+        return 2
+    for i in range(len(thresholds)):
+        if x < thresholds[i]:
+            return 3 + i
+    if x < big:
+        return len(thresholds) + 3
+    return len(thresholds) + 4
+
+def _round_positive(x, n, regime, table):
+    # _round_to_n for x that isn't negative.
+    if regime == 0:
+        return ('0', _OK)
+    if regime == 1:
+        return (table[2], _OK)
+    if regime == 2 or regime == n+4:
+        mantissa, exponent = format(x, '.18e' if regime == 2 else '.17e').split('e')
         exponent = 'e' + str(int(exponent))
         mantissa = str(round(float(mantissa), max(0,n-len(exponent)-2)))
         mantissa = mantissa[:n-len(exponent)]
         if mantissa[-1] == '.':
             mantissa = mantissa[:-1]
         return (mantissa + exponent, _OK)
-    return (float('9e' + '9'*(n-2)), _OF)
+    if regime == n+5:
+        return (table[5], _OF)
+    i = regime - 3
+    if i == n:
+        out = str(int(round(x)))[:n]
+    else:
+        out = str(round(x,n-i-1))[:n]
+        if out[-1] == '.':
+            #out = str(round(x,n-i-1))[:n-1]
+            out = out[:-1]
+    out = out[:n]
+    if out[-1] == '.':
+        out = out[:-1]
+    return (out, _OK)
+
+def _options(width, overflow, underflow):
+    # round_to_width's checked and normalized width, overflow and underflow.
+    width = int(width)
+    if width == 0:
+        # returning '' is a silent failure, which we don't want.
+        raise ValueError('width must be > 0')
+    overflow = overflow.lower()
+    underflow = underflow.lower()
+    if underflow in ('raise', 'except'):
+        underflow = 'exception'
+    if (underflow == 'word' and width < 3) or (underflow == 'word' and width < 2):
+        underflow = 'exception'
+    if overflow in ('raise', 'except') or (width < 4 and overflow in ('inf', 'nan')):
+        overflow = 'exception'
+    if overflow not in ('exception', 'saturate', 'inf', 'nan', 'word'):
+        raise ValueError("overflow must be one of 'exception', 'saturate', 'inf', 'nan', 'word'")
+    if underflow not in ('zero', 'saturate', 'exception', 'word'):
+        raise ValueError("underflow must be one of 'zero', 'saturate', 'exception', 'word'")
+    return width, overflow, underflow
 
 def round_to_width(x, width=8, align='left', overflow='saturate', leading_zero=False, underflow='zero'):
     '''
@@ -164,22 +218,7 @@ def round_to_width(x, width=8, align='left', overflow='saturate', leading_zero=F
                 Replaced by 'exception' if width < 3.
     leading_zero: If True, 0.5 will be formatted as '0.5', otherwise '.5'
     '''
-    width = int(width)
-    if width == 0:
-        # returning '' is a silent failure, which we don't want.
-        raise ValueError('width must be > 0')
-    overflow = overflow.lower()
-    underflow = underflow.lower()
-    if underflow in ('raise', 'except'):
-        underflow = 'exception'
-    if (underflow == 'word' and width < 3) or (underflow == 'word' and width < 2):
-        underflow = 'exception'
-    if overflow in ('raise', 'except') or (width < 4 and overflow in ('inf', 'nan')):
-        overflow = 'exception'
-    if overflow not in ('exception', 'saturate', 'inf', 'nan', 'word'):
-        raise ValueError("overflow must be one of 'exception', 'saturate', 'inf', 'nan', 'word'")
-    if underflow not in ('zero', 'saturate', 'exception', 'word'):
-        raise ValueError("underflow must be one of 'zero', 'saturate', 'exception', 'word'")
+    width, overflow, underflow = _options(width, overflow, underflow)
     out, status = '', ''
     if width == 1:
         out, status = _round_to_1(x)
@@ -219,3 +258,441 @@ def round_to_width(x, width=8, align='left', overflow='saturate', leading_zero=F
             out = 'OVERFLOW' if status == _OF else '-OVERFLOW'
             out = out[:min(len(out), width)]
     return out
+
+def make_formatter(width=8, align='left', overflow='saturate', leading_zero=False, underflow='zero'):
+    '''
+    Returns a function that's round_to_width with these arguments, ie
+    label = make_formatter(3)
+    label(1234) -> '1e3'
+    label(3.1415) -> '3.1'
+    The arguments and the strings are exactly the same as round_to_width's,
+    but it's much faster when lots of numbers are rounded the same way: the
+    options are only checked once, and the width's thresholds and what
+    underflowing numbers become are worked out in advance. Numbers that
+    overflow are handed to round_to_width, so they're handled the same.
+    '''
+    width, overflow, underflow = _options(width, overflow, underflow)
+    table = _table(width) if 3 < width < 25 else None
+    negative_table = _table(width-1) if 4 < width < 25 else None
+    pad = str.ljust if align == 'left' else str.rjust
+    # (what a negative number that rounds to '0' becomes, a positive one)
+    # None means round_to_width's
+    underflows = (None, None)
+    if underflow == 'saturate':
+        temp_arr = [('1', '1'), ('.1', '1'), ('.01', '0.1'),
+                    ('1e-9', '1e-9'), ('1e-99', '1e-99')]
+        if width-2 < len(temp_arr):
+            underflows = ('-' + temp_arr[width-2][leading_zero], None)
+        if width-1 < len(temp_arr):
+            underflows = (underflows[0], temp_arr[width-1][leading_zero])
+    elif underflow == 'word':
+        underflows = ('-ep' if width == 3 else '-eps', 'eps')
+    underflows = tuple(None if out is None else pad(out, width) for out in underflows)
+    def formatter(x):
+        if table is None:
+            if width == 1:
+                out, status = _round_to_1(x)
+            elif width == 2:
+                out, status = _round_to_2(x, leading_zero)
+            else:
+                out, status = _round_to_n(x, width, leading_zero)
+        elif x < 0:
+            # like _round_to_n, which rounds -x to one less digit
+            if negative_table is None:
+                out, status = _round_to_3(-x, leading_zero)
+            else:
+                out, status = _round_positive(-x, width-1, _regime(-x, negative_table), negative_table)
+            if status == _OK:
+                out = '-' + out
+        else:
+            out, status = _round_positive(x, width, _regime(x, table), table)
+        if status != _OK:
+            return round_to_width(x, width, align, overflow, leading_zero, underflow)
+        if out == '0' and x != 0 and underflow != 'zero':
+            if underflow == 'exception':
+                raise ValueError('Underflow')
+            out = underflows[x > 0]
+            if out is None:
+                return round_to_width(x, width, align, overflow, leading_zero, underflow)
+            return out
+        return pad(out, width)
+    return formatter
+
+# Arrays shorter than this aren't worth NumPy's overhead in round_to_width_array.
+_NUMPY_MIN_SIZE = 256
+
+def _numpy_regimes(values, table, negative_table):
+    # If values is a NumPy array of numbers that round_to_width_array can
+    # round a regime at a time, (values, the _regime of each value), all at
+    # once, where a negative x has -1 minus the _regime of -x with
+    # negative_table (or just -1 if there's no negative_table). Otherwise
+    # (the values, None), where 64 bit values are a list of Python numbers,
+    # which round faster and more exactly than NumPy's
+    # (round(numpy.float64(0.015), 2) is 0.02, not 0.01).
+    # NumPy is only imported if it's been given a NumPy array.
+    if not type(values).__module__.startswith('numpy'):
+        return values, None
+    try:
+        import numpy as np
+    except:
+        return values, None
+    if not isinstance(values, np.ndarray) or values.ndim != 1 or values.dtype.kind not in 'iuf':
+        return values, None
+    items = values.tolist() if values.dtype.itemsize == 8 else values
+    if table is None or len(values) < _NUMPY_MIN_SIZE:
+        return items, None
+    if values.dtype.kind != 'f':
+        # Integers are compared as floats, which is only exact up to 2**53,
+        # and the most negative integer can't be negated.
+        low, high = values.min(), values.max()
+        if high >= 2**53 or low <= -2**53 or (values.dtype.kind == 'i' and low == np.iinfo(values.dtype).min):
+            return items, None
+    x = values.astype(np.float64)
+    regimes = np.full(len(x), -1, dtype=np.intp)
+    negative = x < 0
+    for t, which, sign in ((table, ~negative, 1), (negative_table, negative, -1)):
+        if t is None:
+            continue
+        zero, one, one_str, thresholds, big, saturated = t
+        # the number of limits at or below x, after rounding to '0'
+        limits = [one, .001] + thresholds + [big]
+        found = 1 + np.searchsorted(limits, sign*x[which], side='right')
+        found[sign*x[which] <= zero] = 0
+        regimes[which] = found if sign == 1 else -1 - found
+    return values, regimes
+
+def _regime_strings(xs, n, regime, table):
+    # _round_positive's strings for the numbers xs, which are all in regime,
+    # made in one go, or None if they overflow.
+    if regime == 0:
+        return ['0']*len(xs)
+    if regime == 1:
+        return [table[2]]*len(xs)
+    if regime == n+5:
+        return None
+    if regime == 2 or regime == n+4:
+        # as in _round_positive
+        parts = [format(x, '.18e' if regime == 2 else '.17e').split('e') for x in xs]
+        exponents = ['e' + str(int(exponent)) for mantissa, exponent in parts]
+        strings = [str(round(float(mantissa), max(0, n-len(exponent)-2)))[:n-len(exponent)]
+                   for (mantissa, _), exponent in zip(parts, exponents)]
+        return [(mantissa[:-1] if mantissa[-1] == '.' else mantissa) + exponent
+                for mantissa, exponent in zip(strings, exponents)]
+    i = regime - 3
+    if i == n:
+        strings = [str(int(round(x)))[:n] for x in xs]
+    else:
+        digits = n-i-1
+        strings = [str(round(x, digits))[:n] for x in xs]
+    return [out[:-1] if out[-1] == '.' else out for out in strings]
+
+def _numpy_decimals(np, x, digits, error=1):
+    # str(round(x, digits)) for an array x (that isn't negative), made with
+    # NumPy, as long as the decimals have at most 15 digits, when that's the
+    # decimal that x rounds to with trailing zeros (but one) left off, and
+    # which ones NumPy can't be sure of, for x that's out by up to error
+    # units in the last place.
+    scaled = x*10.0**digits
+    rounded = np.rint(scaled)
+    # scaled is out by another half a unit in the last place, so a number
+    # that close to halfway might round the other way
+    unsure = np.abs(np.abs(scaled - rounded) - 0.5) <= (error + 1)*np.spacing(scaled)
+    rounded = rounded.astype(np.int64)
+    whole = (rounded // 10**digits).astype(str)
+    fraction = np.char.rstrip(np.char.zfill((rounded % 10**digits).astype(str), digits), '0')
+    fraction[np.char.str_len(fraction) == 0] = '0'
+    return np.char.add(np.char.add(whole, '.'), fraction), unsure
+
+def _numpy_regime_strings(np, x, n, regime):
+    # _regime_strings for an array x (that isn't negative) in a decimal, the
+    # integer or an exponent regime, made entirely with NumPy, or None where
+    # NumPy can't be sure of making exactly the same strings.
+    import sys
+    if sys.version_info[0] < 3 or not 2 <= regime <= n+4:
+        # Python 2's str only gives 12 digits of a float
+        return None
+    i = regime - 3
+    if x.dtype.kind in 'iu' and i <= n:
+        # round leaves an integer as it is
+        return x.astype(str)
+    if x.dtype != np.float64 and 0 <= i:
+        # round rounds a smaller float the way NumPy does, but format (for
+        # the exponent regimes) makes it a Python float first
+        return None
+    x = x.astype(np.float64)
+    if i == n:
+        # rint rounds halves to even like round, and int64 holds 18 digits
+        return np.rint(x).astype(np.int64).astype(str) if n <= 18 else None
+    if n > 16:
+        return None
+    if 0 <= i < n:
+        strings, unsure = _numpy_decimals(np, x, n-i-1)
+        strings = np.char.rstrip(strings.astype('U%d' % n), '.')
+    else:
+        # as in _round_positive, the mantissa of x (which is off by a few
+        # units in the last place, so it's unsure near 1 and 10 and near
+        # halfway) rounded to fit beside the exponent
+        exponents = np.floor(np.log10(x)).astype(np.intp)
+        exponents[x < 10.0**exponents] -= 1
+        # not 10.0**(exponents+1), which overflows near 1e308
+        exponents[x/10.0 >= 10.0**exponents] += 1
+        if exponents.min() < -300:
+            return None
+        # 10.0**-308 is subnormal, so big numbers are divided instead
+        mantissas = np.where(exponents < 0, x*10.0**-np.minimum(exponents, 0),
+                             x/10.0**np.maximum(exponents, 0))
+        unsure = ((mantissas - 1 <= 4*np.spacing(1.0)) |
+                  (10 - mantissas <= 4*np.spacing(10.0)))
+        exponents = np.char.add('e', exponents.astype(str))
+        lengths = np.char.str_len(exponents)
+        strings = np.empty(len(x), dtype='U%d' % n)
+        for length in np.unique(lengths).tolist():
+            which = lengths == length
+            mantissa, mantissa_unsure = _numpy_decimals(np, mantissas[which], max(0, n-length-2), 4)
+            unsure[which] |= mantissa_unsure
+            mantissa = np.char.rstrip(mantissa.astype('U%d' % max(1, n-length)), '.')
+            strings[which] = np.char.add(mantissa, exponents[which])
+    # and Python makes the unsure ones
+    for k in np.flatnonzero(unsure).tolist():
+        strings[k] = _regime_strings([float(x[k])], n, regime, None)[0]
+    return strings
+
+def _round_regimes(values, regimes, width, table, negative_table, align, overflow, leading_zero, underflow):
+    # round_to_width_array for a NumPy array and its regimes from
+    # _numpy_regimes. The values are sorted into regimes with NumPy, the
+    # strings for each regime are made together, with NumPy where it can be
+    # exact (see _numpy_regime_strings) and otherwise one expression for the
+    # whole regime (see _regime_strings), and NumPy puts them back in order.
+    import numpy as np
+    order = np.argsort(regimes, kind='stable')
+    ordered = regimes[order]
+    starts = np.flatnonzero(np.concatenate(([True], ordered[1:] != ordered[:-1]))).tolist()
+    pad = str.ljust if align == 'left' else str.rjust
+    wide = values.dtype.itemsize == 8
+    out = np.empty(len(values), dtype=object)
+    for start, end in zip(starts, starts[1:] + [len(order)]):
+        regime = int(ordered[start])
+        where = order[start:end]
+        if regime >= 0 or negative_table is not None:
+            n = width if regime >= 0 else width-1
+            x = values[where] if regime >= 0 else -values[where]
+            strings = _numpy_regime_strings(np, x, n, regime if regime >= 0 else -1-regime)
+            if strings is not None:
+                if regime < 0:
+                    strings = np.char.add('-', strings)
+                out[where] = np.char.ljust(strings, width) if align == 'left' else np.char.rjust(strings, width)
+                continue
+        xs = values[where].tolist() if wide else list(values[where])
+        if regime >= 0:
+            strings = _regime_strings(xs, width, regime, table)
+            if regime == 0 and underflow != 'zero':
+                strings = [None if x != 0 else result for x, result in zip(xs, strings)]
+        elif negative_table is None:
+            # like _round_to_n, which rounds -x to 3 digits
+            strings = []
+            for x in xs:
+                result, status = _round_to_3(-x, leading_zero)
+                strings.append('-' + result if status == _OK else None)
+        else:
+            strings = _regime_strings([-x for x in xs], width-1, -1-regime, negative_table)
+            if strings is not None:
+                strings = ['-' + result for result in strings]
+        if strings is None:
+            strings = [None]*len(xs)
+        # None is for round_to_width, for underflow and overflow
+        out[where] = [pad(result, width) if result is not None else
+                      round_to_width(x, width, align, overflow, leading_zero, underflow)
+                      for x, result in zip(xs, strings)]
+    return out.tolist()
+
+def round_to_width_array(values, width=8, align='left', overflow='saturate', leading_zero=False, underflow='zero'):
+    '''
+    round_to_width for every number in values (a list, NumPy array or
+    anything else you can loop over), returning a list of strings, ie
+    round_to_width_array([1234, 3.1415, -3.1415], 3) -> ['1e3', '3.1', '-3 ']
+    The arguments and the strings are exactly the same as round_to_width's,
+    but it's much faster for lots of numbers: the options are only checked
+    once, and for a NumPy array, the regime of each number (integer,
+    decimal, small exponent, large exponent or overflow) is decided with
+    NumPy and the strings are made a regime at a time, with the same
+    rounding as round_to_width. Numbers that underflow or overflow are
+    handed to round_to_width, so they're handled the same.
+    '''
+    width, overflow, underflow = _options(width, overflow, underflow)
+    table = _table(width) if 3 < width < 25 else None
+    negative_table = _table(width-1) if 4 < width < 25 else None
+    values, regimes = _numpy_regimes(values, table, negative_table)
+    if regimes is not None:
+        return _round_regimes(values, regimes, width, table, negative_table,
+                              align, overflow, leading_zero, underflow)
+    left = align == 'left'
+    strings = []
+    for x in values:
+        if table is None:
+            if width == 1:
+                out, status = _round_to_1(x)
+            elif width == 2:
+                out, status = _round_to_2(x, leading_zero)
+            else:
+                out, status = _round_to_n(x, width, leading_zero)
+        elif x < 0:
+            # like _round_to_n, which rounds -x to one less digit
+            if negative_table is None:
+                out, status = _round_to_3(-x, leading_zero)
+            else:
+                out, status = _round_positive(-x, width-1, _regime(-x, negative_table), negative_table)
+            if status == _OK:
+                out = '-' + out
+        else:
+            out, status = _round_positive(x, width, _regime(x, table), table)
+        if status != _OK or (out == '0' and x != 0 and underflow != 'zero'):
+            strings.append(round_to_width(x, width, align, overflow, leading_zero, underflow))
+        elif left:
+            strings.append(out.ljust(width))
+        else:
+            strings.append(out.rjust(width))
+    return strings
+
+def _table_columns(widths, align, overflow, leading_zero, underflow):
+    # format_table's [(width, align, overflow, leading_zero, underflow)] for
+    # each column, and whether the last one is repeated for any more columns
+    # (when none of the arguments are lists).
+    options = [widths, align, overflow, leading_zero, underflow]
+    lengths = set(len(o) for o in options if isinstance(o, (list, tuple)))
+    if len(lengths) > 1:
+        raise ValueError('the lists of column options must all be the same length')
+    if not lengths:
+        return [tuple(options)], True
+    n = lengths.pop()
+    options = [o if isinstance(o, (list, tuple)) else [o]*n for o in options]
+    return list(zip(*options)), False
+
+def _table_formatters(columns, repeat):
+    # (the (width, left aligned, make_formatter) of each column, repeat)
+    return ([(int(c[0]), c[1] == 'left', make_formatter(*c)) for c in columns], repeat)
+
+def _format_row(row, formatters, separator):
+    # One line of format_table.
+    formatters, repeat = formatters
+    cells = []
+    for k, cell in enumerate(row):
+        if k < len(formatters):
+            width, left, formatter = formatters[k]
+        elif repeat:
+            width, left, formatter = formatters[-1]
+        else:
+            raise ValueError('a row has %d cells but there are %d columns' % (len(row), len(formatters)))
+        if cell is None:
+            cell = ''
+        if hasattr(cell, 'strip'):
+            # text, like everything from a CSV file, is rounded if it's a
+            # number, otherwise cut to the column's width, including words
+            # like 'nan' and 'inf' that float takes
+            try:
+                number = float(cell)
+            except ValueError:
+                number = None
+            if number is not None and number - number == 0:
+                cell = number
+            else:
+                cell = cell[:width]
+                cells.append(cell.ljust(width) if left else cell.rjust(width))
+                continue
+        cells.append(formatter(cell))
+    return separator.join(cells)
+
+_table_worker = None
+
+def _init_table_worker(columns, repeat, separator):
+    # Pool initializer for format_table, since the formatters can't be pickled.
+    global _table_worker
+    _table_worker = (_table_formatters(columns, repeat), separator)
+
+def _format_rows(rows):
+    formatters, separator = _table_worker
+    return [_format_row(row, formatters, separator) for row in rows]
+
+def _chunks(rows, size):
+    # Lists of size rows at a time.
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _csv_rows(path):
+    import csv # Only tables from CSV files need this
+    f = open(path, 'rb') if str is bytes else open(path, newline='')
+    try:
+        for row in csv.reader(f):
+            yield row
+    finally:
+        f.close()
+
+def format_table(rows, widths=8, align='left', overflow='saturate', leading_zero=False, underflow='zero', separator=' ', processes=1, chunk_size=10000):
+    '''
+    Makes a fixed width text table, yielding its lines (without newlines) as
+    they're made, so tables of any size take the same amount of memory, ie
+    >>> for line in format_table([[1, 3.1415], [1234, -2.5e-9]], [3, 5]):
+    ...     print(line)
+    1   3.142
+    1e3 -2e-9
+    Every number is rounded with round_to_width, so every cell fits its column.
+    rows: An iterable of rows (lists, tuples or whatever) of numbers or text,
+          or the path of a CSV file. Text that's a number, like everything in a
+          CSV file, is rounded like a number, and other text (like a header)
+          is cut to the column's width and aligned the same way.
+    widths, align, overflow, leading_zero, underflow: round_to_width's
+            arguments for each column, either a list (or tuple) with one for
+            each column, or one value for every column.
+    separator: The text between columns.
+    processes: The number of processes that make lines. If it's more than 1
+               (or None, for one for each core), rows are sent to worker
+               processes chunk_size at a time, and the lines still come out
+               in order. Only a couple of chunks for each process are
+               waiting at once, so it still takes the same amount of memory.
+    '''
+    if hasattr(rows, 'strip'):
+        rows = _csv_rows(rows)
+    columns, repeat = _table_columns(widths, align, overflow, leading_zero, underflow)
+    if processes == 1:
+        formatters = _table_formatters(columns, repeat)
+        for row in rows:
+            yield _format_row(row, formatters, separator)
+        return
+    import multiprocessing # Only tables made by worker processes need this
+    pool = multiprocessing.Pool(processes, _init_table_worker, (columns, repeat, separator))
+    try:
+        pending = []
+        limit = 2*(processes or multiprocessing.cpu_count())
+        for chunk in _chunks(rows, chunk_size):
+            pending.append(pool.apply_async(_format_rows, (chunk,)))
+            if len(pending) >= limit:
+                for line in pending.pop(0).get():
+                    yield line
+        for result in pending:
+            for line in result.get():
+                yield line
+    finally:
+        pool.terminate()
+
+def write_table(rows, outfile, *args, **kwargs):
+    '''
+    Writes format_table(rows, ...) to outfile (a file or the path of one),
+    a line at a time. Returns the number of lines.
+    '''
+    close = not hasattr(outfile, 'write')
+    if close:
+        outfile = open(outfile, 'w')
+    lines = 0
+    try:
+        for line in format_table(rows, *args, **kwargs):
+            outfile.write(line + '\n')
+            lines += 1
+    finally:
+        if close:
+            outfile.close()
+    return lines
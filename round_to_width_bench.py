@@ -0,0 +1,303 @@
+# Benchmarks and checks round_to_width.py, so that faster or vectorized
+# versions of round_to_width can be trusted. It:
+# times round_to_width, make_formatter, round_to_width_array and
+# terminal_plot's copy in calls per second, for each width and each regime of
+# value (rounds to '0', small exponent, decimal, integer, large exponent,
+# overflow, and the negative versions),
+# checks that they all give exactly the same strings (or exceptions) for every
+# combination of options, which fails the run if they don't,
+# and checks round_to_width's results against a slow oracle for its contract:
+# the string is exactly width characters, and no number that fits is closer
+# (among plain decimals like '0.012' and exponents like '1.2e-2', the ones
+# round_to_width can give), unless it reads back as exactly the same double.
+# Values include both sides of every decade and rounding boundary.
+# round_to_width doesn't always keep the contract (like
+# round_to_width(0.00123, 4) -> '0.00'), so these are only reported, unless
+# --strict is given.
+# python round_to_width_bench.py
+# --output=results.json writes the results there as JSON. --repeat=N takes the
+# best of N runs of each timing (3 by default). --quick uses fewer values.
+import decimal
+import itertools
+import json
+import math
+import random
+import sys
+import time
+
+import round_to_width as rtw
+import terminal_plot
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+WIDTHS = range(1, 27)
+OPTIONS = list(itertools.product(['left', 'right'], ['saturate', 'exception', 'inf', 'nan', 'word'],
+                                 [False, True], ['zero', 'saturate', 'exception', 'word']))
+# Exact enough for the difference between any two doubles.
+CONTEXT = decimal.Context(prec=2000)
+
+def best_time(func, repeat):
+    # The fastest of repeat calls to func, in seconds.
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def boundary_values():
+    # Numbers on and right next to the places where round_to_width's output
+    # changes: powers of ten, the halfway points where a digit rounds up
+    # (0.95, 0.995, ...), and where numbers start rounding to '0' or '1e-99'.
+    values = [0.0, 1.0, float('inf'), float('nan')]
+    for e in range(-110, 110):
+        scale = '1e%d' % e
+        edges = ['1', '0.5', '1.5', '5'] + ['9'*k + '5' for k in range(1, 18)]
+        for edge in edges:
+            x = float(decimal.Decimal(edge if edge[0] != '9' else '0.' + edge) * decimal.Decimal(scale))
+            if x == 0 or math.isinf(x):
+                continue
+            values += [x, math.nextafter(x, 0), math.nextafter(x, math.inf)]
+    return values
+
+def random_values(count, seed=0):
+    # Numbers spread evenly over the orders of magnitude round_to_width can
+    # give, and some it can't.
+    rng = random.Random(seed)
+    return [rng.uniform(1, 10) * 10.0**rng.randint(-120, 120) for _ in range(count)]
+
+def sample_values(quick=False):
+    values = boundary_values() + random_values(2000 if quick else 20000)
+    values += [-x for x in values]
+    if quick:
+        values = values[::4]
+    return values
+
+def regime(x, width):
+    # The name of the branch of round_to_width that x takes at width.
+    if width < 4:
+        return 'helper'
+    if width >= 25:
+        return 'str'
+    sign = ''
+    if x < 0:
+        if width == 4:
+            return 'negative helper'
+        sign, x, width = 'negative ', -x, width-1
+    code = rtw._regime(x, rtw._table(width))
+    if 3 <= code < width + 3:
+        name = 'decimal'
+    else:
+        name = {0: 'zero', 1: 'smallest', 2: 'small exponent', width+3: 'integer',
+                width+4: 'large exponent', width+5: 'overflow'}[code]
+    return sign + name
+
+def outcome(func, *args):
+    # func's result, or its exception's type and message.
+    try:
+        return func(*args)
+    except Exception as e:
+        return (type(e).__name__, str(e))
+
+def bench_width(values, width, repeat):
+    # Calls per second of each version on values, the same width each time.
+    formatter = rtw.make_formatter(width)
+    plot_formatter = terminal_plot._make_formatter(width)
+    n = len(values)
+    results = {
+        'round_to_width': n / best_time(lambda: [rtw.round_to_width(x, width) for x in values], repeat),
+        'make_formatter': n / best_time(lambda: [formatter(x) for x in values], repeat),
+        'round_to_width_array': n / best_time(lambda: rtw.round_to_width_array(values, width), repeat),
+        'terminal_plot': n / best_time(lambda: [plot_formatter(x) for x in values], repeat),
+    }
+    if np is not None:
+        array = np.array(values)
+        results['round_to_width_array_numpy'] = n / best_time(lambda: rtw.round_to_width_array(array, width), repeat)
+    return results
+
+def bench(values, repeat, per_regime=1000):
+    # {width: {regime: calls per second of each version}}, timed on up to
+    # per_regime values that don't raise exceptions.
+    results = {}
+    for width in WIDTHS:
+        by_regime = {}
+        for x in values:
+            xs = by_regime.setdefault(regime(x, width), [])
+            if len(xs) < per_regime and isinstance(outcome(rtw.round_to_width, x, width), str):
+                xs.append(x)
+        results[width] = {name: dict(bench_width(xs, width, repeat), values=len(xs))
+                          for name, xs in sorted(by_regime.items()) if xs}
+    return results
+
+def check_copies(values, all_options_values):
+    # Each version's strings for every width and combination of options
+    # (only for all_options_values, the rest with the default options),
+    # compared to round_to_width's. Returns a list of the mismatches.
+    mismatches = []
+    def compare(name, got, want, width, options):
+        for x, a, b in zip(values_checked, got, want):
+            if a != b:
+                mismatches.append({'version': name, 'x': repr(x), 'width': width,
+                                   'options': options, 'got': repr(a), 'expected': repr(b)})
+    for width in WIDTHS:
+        for options in [('left', 'saturate', False, 'zero')] + OPTIONS:
+            values_checked = values if options == ('left', 'saturate', False, 'zero') else all_options_values
+            want = [outcome(rtw.round_to_width, x, width, *options) for x in values_checked]
+            compare('terminal_plot._round_to_width',
+                    [outcome(terminal_plot._round_to_width, x, width, *options) for x in values_checked],
+                    want, width, options)
+            for name, module in (('make_formatter', rtw), ('terminal_plot._make_formatter', terminal_plot)):
+                make = getattr(module, name.split('.')[-1])
+                formatter = outcome(make, width, *options)
+                if isinstance(formatter, tuple):
+                    got = [formatter]*len(values_checked)
+                else:
+                    got = [outcome(formatter, x) for x in values_checked]
+                compare(name, got, want, width, options)
+            if all(isinstance(w, str) for w in want):
+                inputs = [('round_to_width_array', values_checked)]
+                if np is not None:
+                    inputs.append(('round_to_width_array numpy', np.array(values_checked)))
+                for name, data in inputs:
+                    got = outcome(rtw.round_to_width_array, data, width, *options)
+                    if isinstance(got, tuple):
+                        got = [got]*len(values_checked)
+                    compare(name, got, want, width, options)
+    return mismatches
+
+def _decimal_candidates(x, n):
+    # Plain decimals of at most n characters nearest x (which is positive),
+    # with and without a leading zero.
+    for places in range(n+1):
+        step = decimal.Decimal(1).scaleb(-places)
+        for rounding in (decimal.ROUND_FLOOR, decimal.ROUND_CEILING):
+            s = '{:f}'.format(x.quantize(step, rounding=rounding, context=CONTEXT))
+            yield s
+            if s.startswith('0.'):
+                yield s[1:]
+
+def _exponent_candidates(x, n):
+    # Numbers like '1.2e-3' of at most n characters nearest x (which is
+    # positive), with a mantissa from 1 to 10.
+    for exponent in (x.adjusted(), x.adjusted() + 1):
+        mantissa = x.scaleb(-exponent, context=CONTEXT)
+        for places in range(n):
+            step = decimal.Decimal(1).scaleb(-places)
+            for rounding in (decimal.ROUND_FLOOR, decimal.ROUND_CEILING):
+                m = mantissa.quantize(step, rounding=rounding, context=CONTEXT)
+                if 1 <= m < 10:
+                    yield '{:f}'.format(m) + 'e' + str(exponent)
+
+def oracle(x, width):
+    # The smallest distance from x to any number round_to_width could give at
+    # width, or None if x is too big for any of them.
+    exact = decimal.Decimal(x)
+    candidates = ['0']
+    if x > 0:
+        candidates += _decimal_candidates(exact, width)
+        candidates += _exponent_candidates(exact, width)
+    elif x < 0 and width > 1:
+        candidates += ['-' + c for c in _decimal_candidates(-exact, width-1)]
+        candidates += ['-' + c for c in _exponent_candidates(-exact, width-1)]
+    candidates = [decimal.Decimal(c) for c in candidates if len(c) <= width]
+    if len(candidates) == 1 and abs(exact) >= 1:
+        return None # only '0' fits, so round_to_width overflows
+    return min(abs(CONTEXT.subtract(c, exact)) for c in candidates)
+
+def check_oracle(values, widths, examples=5):
+    # {width: {regime: counts of results that raise exceptions, don't fit, or
+    # aren't the closest, with a few examples}}, with the default options.
+    results = {}
+    for width in widths:
+        results[width] = {}
+        for x in values:
+            if math.isnan(x) or math.isinf(x):
+                continue
+            out = outcome(rtw.round_to_width, x, width)
+            best = oracle(x, width)
+            counts = results[width].setdefault(regime(x, width), {'values': 0, 'exceptions': 0, 'wrong_width': 0,
+                                                                  'not_closest': 0, 'examples': []})
+            counts['values'] += 1
+            problem = None
+            if isinstance(out, tuple):
+                counts['exceptions'] += 1
+                problem = 'exception'
+                out = ': '.join(out)
+            elif len(out) != width:
+                counts['wrong_width'] += 1
+                problem = 'wrong width'
+            if best is not None and problem != 'exception':
+                try:
+                    error = abs(CONTEXT.subtract(decimal.Decimal(out.strip()), decimal.Decimal(x)))
+                except decimal.InvalidOperation:
+                    error = None
+                # a string that reads back as x is as close as a double can tell
+                if error is None or (error > best and float(out) != x):
+                    counts['not_closest'] += 1
+                    problem = problem or 'not closest'
+            if problem and len(counts['examples']) < examples:
+                counts['examples'].append([repr(x), out, problem])
+    return results
+
+def run(repeat=3, quick=False):
+    values = sample_values(quick)
+    results = {'values': len(values)}
+    results['speed'] = bench(values, repeat, 200 if quick else 1000)
+    all_options_values = values[::10 if quick else 40]
+    results['mismatches'] = check_copies(values, all_options_values)
+    results['oracle'] = check_oracle(values[::4 if quick else 2], WIDTHS)
+    return results
+
+def print_results(results):
+    print(f"{results['values']} values")
+    names = list(next(iter(next(iter(results['speed'].values())).values())))
+    names.remove('values')
+    labels = {'round_to_width': 'scalar', 'make_formatter': 'formatter', 'round_to_width_array': 'array',
+              'terminal_plot': 'terminal_plot', 'round_to_width_array_numpy': 'numpy array'}
+    print(f"{'width':>5} {'regime':<24}" + ''.join(f' {labels[name]:>14}' for name in names) + '  (calls/s)')
+    for width, by_regime in results['speed'].items():
+        for name, r in by_regime.items():
+            print(f'{width:>5} {name:<24}' + ''.join(f' {r[n]:14.0f}' for n in names))
+    print(f"{len(results['mismatches'])} results differ from round_to_width")
+    for m in results['mismatches'][:20]:
+        print(f"  {m['version']}({m['x']}, {m['width']}, {m['options']}) gave {m['got']}, not {m['expected']}")
+    problems = ('exceptions', 'wrong_width', 'not_closest')
+    totals = dict.fromkeys(problems, 0)
+    for width, by_regime in results['oracle'].items():
+        for name, r in by_regime.items():
+            for problem in problems:
+                totals[problem] += r[problem]
+            if any(r[problem] for problem in problems):
+                print(f"width {width} {name}: " + ', '.join(f'{r[p]} {p}' for p in problems) +
+                      f" of {r['values']}, like " + ', '.join(f'{x} -> {out!r}' for x, out, _ in r['examples'][:3]))
+    print('oracle: ' + ', '.join(f'{totals[p]} {p}' for p in problems))
+
+if __name__ == '__main__':
+    output = None
+    repeat = 3
+    quick = False
+    strict = False
+    for arg in sys.argv[1:]:
+        if arg.startswith('--output='):
+            output = arg[len('--output='):]
+        elif arg.startswith('--repeat='):
+            repeat = int(arg[len('--repeat='):])
+        elif arg == '--quick':
+            quick = True
+        elif arg == '--strict':
+            strict = True
+        else:
+            sys.exit(f'unknown argument {arg}')
+    results = run(repeat, quick)
+    print_results(results)
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+    oracle_failures = sum(r['exceptions'] + r['wrong_width'] + r['not_closest'] for by_regime in results['oracle'].values()
+                          for r in by_regime.values())
+    if results['mismatches'] or (strict and oracle_failures):
+        sys.exit(1)
@@ -20,6 +20,14 @@ Features:
    extra newlines here and there, so I added all of those newlines here.
  - Only uses ASCII characters.
  - It just works
+ - LivePlot keeps redrawing a plot of the latest points in place, for
+   watching a live metric.
+ - If you give plot NumPy arrays, it uses NumPy to bin the points, which is
+   much faster for big arrays. NumPy is only imported if you give it NumPy
+   arrays, and the plot is exactly the same either way.
+ - ColumnFile (for text files) and map_array (for binary files, with NumPy)
+   let plot and the bar charts show files too big to load, keeping only a
+   line or a chunk of the file in memory at a time.
 
 Demonstration:
 import numpy as np
@@ -30,6 +38,16 @@ plot(x, y, width=60, height=20)
 plot(x*1e-9, y, stem=True)
 horizontal_bar_chart(x*1e-9, y**2)
 horizontal_bar_chart(y**2)
+for page in horizontal_bar_chart_pages(y**2, page_size=20):
+    print(page)
+
+live = LivePlot(100, width=60, height=15)
+for v in y:
+    live.append(v)
+
+live.draw()
+np.save('y.npy', y)
+plot(map_array('y.npy'), density='log')
 
 License:
 This is free and unencumbered software released into the public domain.
@@ -63,7 +81,25 @@ try: # In case you somehow don't have the os module
 except:
     pass
 
+try: # Only LivePlot uses these
+    import sys
+    import time
+except:
+    pass
+
 _dummy = object()
+# Translates a canvas row's counts to marks, ' ' for none, '*' for one and '#'
+# for more.
+_MARKS = bytearray(b' *' + b'#'*254)
+# Translates density levels to marks, from no points to the most.
+_RAMP = bytearray(b' .:-=+*#%@' + b'@'*246)
+_RAMP_STEPS = 9
+_BYTES_ARE_STR = str is bytes # Python 2
+
+def _ascii(b):
+    # A bytearray of ASCII characters as a str.
+    return str(b) if _BYTES_ARE_STR else b.decode('ascii')
+
 _NEG_OF = 'negative overflow'
 _OF = 'overflow'
 _OK = 'okay'
@@ -117,48 +153,97 @@ def _round_to_n(x, n, leading_zero=False):
         out, status = _round_to_n(-x, n-1, leading_zero)
         status = status if status == _OK else _NEG_OF
         return ('-' + out, status)
-    if x <= float('0.5e-' + '9'*(n-3)):
-        return ('0', _OK)
-    if x < float('1.5e-' + '9'*(n-3)):
-        return ('1e-' + '9'*(n-3), _OK)
+    table = _table(n)
+    return _round_positive(x, n, _regime(x, table), table)
+
+# _round_to_n's constants for each width n from 4 to 24, worked out the first
+# time they're needed instead of on every call.
+_TABLES = {}
+
+def _table(n):
+    # (at most this rounds to '0', less than this rounds to the next string,
+    # thresholds, less than this fits with an exponent, the saturated value)
+    # where a number less than thresholds[i] (and not an earlier one) has i
+    # digits before the decimal point.
+    if n not in _TABLES:
+        threshold_str = '9'*n + '5'
+        thresholds = [float(threshold_str[:i] + '.' + threshold_str[i:]) for i in range(n+1)]
+        _TABLES[n] = (float('0.5e-' + '9'*(n-3)), float('1.5e-' + '9'*(n-3)),
+                      '1e-' + '9'*(n-3), thresholds, float('9.5e' + '9'*(n-2)),
+                      float('9e' + '9'*(n-2)))
+    return _TABLES[n]
+
+# The regimes of a number that's not negative, for _round_positive:
+# 0: rounds to '0'
+# 1: rounds to '1e-99...'
+# 2: small exponent, like '1.5e-4'
+# 3+i for i from 0 to n: decimal with i digits before the decimal point
+#    (i == n is an integer)
+# n+4: large exponent, like '1.5e12'
+# n+5: overflow
+def _regime(x, table):
+    zero, one, one_str, thresholds, big, saturated = table
+    if x <= zero:
+        return 0
+    if x < one:
+        return 1
     if x < .001:
-        mantissa, exponent = format(x, '.18e').split('e')
-        exponent = 'e' + str(int(exponent))
-        mantissa = str(round(float(mantissa), max(0,n-len(exponent)-2)))
-        mantissa = mantissa[:n-len(exponent)]
-        if mantissa[-1] == '.':
-            mantissa = mantissa[:-1]
-        return (mantissa + exponent, _OK)
-    threshold_str = '9'*n + '5'
-    for i in range(n+1):
-        threshold = float(threshold_str[:i] + '.' + threshold_str[i:])
-        if x < threshold:
-            out = ''
-            if i == 0:
-                if not leading_zero:
-                    out = str(round(x,n-i-1))[1:]
-                else:
-                    out = str(round(x,n-i-2))
-            if i == n:
-                out = str(int(round(x)))[:n]
-            else:
-                out = str(round(x,n-i-1))[:n]
-                if out[-1] == '.':
-                    #out = str(round(x,n-i-1))[:n-1]
-                    out = out[:-1]
-            out = out[:n]
-            if out[-1] == '.':
-                out = out[:-1]
-            return (out, _OK)
-    if x < float('9.5e' + '9'*(n-2)):
-        mantissa, exponent = format(x, '.17e').split('e')
+        return 2
+    for i in range(len(thresholds)):
+        if x < thresholds[i]:
+            return 3 + i
+    if x < big:
+        return len(thresholds) + 3
+    return len(thresholds) + 4
+
+def _round_positive(x, n, regime, table):
+    # _round_to_n for x that isn't negative.
+    if regime == 0:
+        return ('0', _OK)
+    if regime == 1:
+        return (table[2], _OK)
+    if regime == 2 or regime == n+4:
+        mantissa, exponent = format(x, '.18e' if regime == 2 else '.17e').split('e')
         exponent = 'e' + str(int(exponent))
         mantissa = str(round(float(mantissa), max(0,n-len(exponent)-2)))
         mantissa = mantissa[:n-len(exponent)]
         if mantissa[-1] == '.':
             mantissa = mantissa[:-1]
         return (mantissa + exponent, _OK)
-    return (float('9e' + '9'*(n-2)), _OF)
+    if regime == n+5:
+        return (table[5], _OF)
+    i = regime - 3
+    if i == n:
+        out = str(int(round(x)))[:n]
+    else:
+        out = str(round(x,n-i-1))[:n]
+        if out[-1] == '.':
+            #out = str(round(x,n-i-1))[:n-1]
+            out = out[:-1]
+    out = out[:n]
+    if out[-1] == '.':
+        out = out[:-1]
+    return (out, _OK)
+
+def _options(width, overflow, underflow):
+    # round_to_width's checked and normalized width, overflow and underflow.
+    width = int(width)
+    if width == 0:
+        # returning '' is a silent failure, which we don't want.
+        raise ValueError('width must be > 0')
+    overflow = overflow.lower()
+    underflow = underflow.lower()
+    if underflow in ('raise', 'except'):
+        underflow = 'exception'
+    if (underflow == 'word' and width < 3) or (underflow == 'word' and width < 2):
+        underflow = 'exception'
+    if overflow in ('raise', 'except') or (width < 4 and overflow in ('inf', 'nan')):
+        overflow = 'exception'
+    if overflow not in ('exception', 'saturate', 'inf', 'nan', 'word'):
+        raise ValueError("overflow must be one of 'exception', 'saturate', 'inf', 'nan', 'word'")
+    if underflow not in ('zero', 'saturate', 'exception', 'word'):
+        raise ValueError("underflow must be one of 'zero', 'saturate', 'exception', 'word'")
+    return width, overflow, underflow
 
 def _round_to_width(x, width=8, align='left', overflow='saturate', leading_zero=False, underflow='zero'):
     '''
@@ -191,22 +276,7 @@ def _round_to_width(x, width=8, align='left', overflow='saturate', leading_zero=
                 Replaced by 'exception' if width < 3.
     leading_zero: If True, 0.5 will be formatted as '0.5', otherwise '.5'
     '''
-    width = int(width)
-    if width == 0:
-        # returning '' is a silent failure, which we don't want.
-        raise ValueError('width must be > 0')
-    overflow = overflow.lower()
-    underflow = underflow.lower()
-    if underflow in ('raise', 'except'):
-        underflow = 'exception'
-    if (underflow == 'word' and width < 3) or (underflow == 'word' and width < 2):
-        underflow = 'exception'
-    if overflow in ('raise', 'except') or (width < 4 and overflow in ('inf', 'nan')):
-        overflow = 'exception'
-    if overflow not in ('exception', 'saturate', 'inf', 'nan', 'word'):
-        raise ValueError("overflow must be one of 'exception', 'saturate', 'inf', 'nan', 'word'")
-    if underflow not in ('zero', 'saturate', 'exception', 'word'):
-        raise ValueError("underflow must be one of 'zero', 'saturate', 'exception', 'word'")
+    width, overflow, underflow = _options(width, overflow, underflow)
     out, status = '', ''
     if width == 1:
         out, status = _round_to_1(x)
@@ -247,6 +317,752 @@ def _round_to_width(x, width=8, align='left', overflow='saturate', leading_zero=
             out = out[:min(len(out), width)]
     return out
 
+def _make_formatter(width=8, align='left', overflow='saturate', leading_zero=False, underflow='zero'):
+    '''
+    Returns a function that's round_to_width with these arguments, ie
+    label = _make_formatter(3)
+    label(1234) -> '1e3'
+    label(3.1415) -> '3.1'
+    The arguments and the strings are exactly the same as round_to_width's,
+    but it's much faster when lots of numbers are rounded the same way: the
+    options are only checked once, and the width's thresholds and what
+    underflowing numbers become are worked out in advance. Numbers that
+    overflow are handed to round_to_width, so they're handled the same.
+    '''
+    width, overflow, underflow = _options(width, overflow, underflow)
+    table = _table(width) if 3 < width < 25 else None
+    negative_table = _table(width-1) if 4 < width < 25 else None
+    pad = str.ljust if align == 'left' else str.rjust
+    # (what a negative number that rounds to '0' becomes, a positive one)
+    # None means round_to_width's
+    underflows = (None, None)
+    if underflow == 'saturate':
+        temp_arr = [('1', '1'), ('.1', '1'), ('.01', '0.1'),
+                    ('1e-9', '1e-9'), ('1e-99', '1e-99')]
+        if width-2 < len(temp_arr):
+            underflows = ('-' + temp_arr[width-2][leading_zero], None)
+        if width-1 < len(temp_arr):
+            underflows = (underflows[0], temp_arr[width-1][leading_zero])
+    elif underflow == 'word':
+        underflows = ('-ep' if width == 3 else '-eps', 'eps')
+    underflows = tuple(None if out is None else pad(out, width) for out in underflows)
+    def formatter(x):
+        if table is None:
+            if width == 1:
+                out, status = _round_to_1(x)
+            elif width == 2:
+                out, status = _round_to_2(x, leading_zero)
+            else:
+                out, status = _round_to_n(x, width, leading_zero)
+        elif x < 0:
+            # like _round_to_n, which rounds -x to one less digit
+            if negative_table is None:
+                out, status = _round_to_3(-x, leading_zero)
+            else:
+                out, status = _round_positive(-x, width-1, _regime(-x, negative_table), negative_table)
+            if status == _OK:
+                out = '-' + out
+        else:
+            out, status = _round_positive(x, width, _regime(x, table), table)
+        if status != _OK:
+            return _round_to_width(x, width, align, overflow, leading_zero, underflow)
+        if out == '0' and x != 0 and underflow != 'zero':
+            if underflow == 'exception':
+                raise ValueError('Underflow')
+            out = underflows[x > 0]
+            if out is None:
+                return _round_to_width(x, width, align, overflow, leading_zero, underflow)
+            return out
+        return pad(out, width)
+    return formatter
+
+_NUMPY_CHUNK = 2**18 # points binned at a time, to limit temporary arrays
+
+def _numpy_module(*arrays):
+    # Returns numpy if all of arrays are NumPy arrays that plot can bin with
+    # NumPy and get exactly the same result as binning them one point at a
+    # time, otherwise None. NumPy is only imported if it's been given NumPy
+    # arrays, so this costs nothing otherwise.
+    for a in arrays:
+        if not type(a).__module__.startswith('numpy'):
+            return None
+    try:
+        import numpy
+    except:
+        return None
+    for a in arrays:
+        if not isinstance(a, numpy.ndarray) or len(a) == 0:
+            return None
+        # smaller floats, like float32, are worked with as float64 (see
+        # _numpy_chunk), but there's nothing to turn bigger ones into
+        if a.dtype.kind not in 'iu' and not (a.dtype.kind == 'f' and a.dtype.itemsize <= 8):
+            return None
+    return numpy
+
+def _numpy_chunk(np, a, start, stop):
+    # a[start:stop], with smaller floats (like float32) as float64, so that
+    # they're binned exactly like a list of their values would be.
+    chunk = a[start:stop]
+    if chunk.dtype.kind == 'f' and chunk.dtype.itemsize < 8:
+        chunk = chunk.astype(np.float64)
+    return chunk
+
+def _numpy_min_max(np, a):
+    # The same as min(a), max(a): the first element equal to the smallest or
+    # largest, skipping NaNs (unless a[0] is NaN, then it's a[0]).
+    if a.dtype.kind == 'f' and np.isnan(a[0]):
+        return a[0], a[0]
+    a_min = a[np.argmax(a == np.nanmin(a))]
+    a_max = a[np.argmax(a == np.nanmax(a))]
+    return a_min, a_max
+
+def _numpy_limits(np, a):
+    # _numpy_min_max a chunk at a time, so that a memory-mapped array is only
+    # read in a chunk at a time.
+    limits = [None, None]
+    for start in range(0, len(a), _NUMPY_CHUNK):
+        chunk = _numpy_chunk(np, a, start, start+_NUMPY_CHUNK)
+        if start and a.dtype.kind == 'f':
+            # min() and max() only notice NaNs at the very start
+            chunk = chunk[~np.isnan(chunk)]
+        if len(chunk):
+            _keep_limits(limits, *_numpy_min_max(np, chunk))
+    return limits[0], limits[1]
+
+def _numpy_points(x, y):
+    # Returns (numpy, x, y) if plot's x and y are NumPy arrays it can bin
+    # with NumPy (see _numpy_module), where x is None for the array indices,
+    # otherwise (None, x, y).
+    np = _numpy_module(x) if y is None else _numpy_module(x, y)
+    if np is None:
+        return None, x, y
+    if y is None and x.ndim == 1:
+        return np, None, x
+    if y is None and x.ndim == 2 and x.shape[1] == 2:
+        return np, x[:, 0], x[:, 1]
+    if y is not None and x.ndim == 1 and y.ndim == 1:
+        return np, x, y
+    return None, x, y
+
+def _numpy_round(np, v):
+    # int(round(v)) for an array of non-negative v, rounding halves the way
+    # this Python version's round does.
+    if round(0.5) == 0: # Python 3 rounds halves to even, like rint
+        return np.rint(v).astype(np.intp)
+    floor = np.floor(v)
+    return (floor + (v - floor >= 0.5)).astype(np.intp)
+
+def _numpy_cells(np, x, y, x_min, x_max, y_min, y_max, width, height):
+    # Yields an array of the cells (row*width + column) that the points inside
+    # the limits land in, a chunk of points at a time. x is None for the
+    # array indices.
+    x_range = x_max - x_min
+    y_range = y_max - y_min
+    n = len(y) if x is None else min(len(x), len(y)) # like zip
+    for start in range(0, n, _NUMPY_CHUNK):
+        stop = min(start+_NUMPY_CHUNK, n)
+        y_pos = _numpy_chunk(np, y, start, stop)
+        if x is None:
+            x_pos = np.arange(start, stop)
+        else:
+            x_pos = _numpy_chunk(np, x, start, stop)
+        keep = (x_min <= x_pos) & (x_pos <= x_max) & (y_min <= y_pos) & (y_pos <= y_max)
+        x_pos = x_pos[keep]
+        y_pos = y_pos[keep]
+        x_coord = _numpy_round(np, (x_pos - x_min)/(x_range*1.0)*(width-1))
+        y_coord = _numpy_round(np, (y_pos - y_min)/(y_range*1.0)*(height-1))
+        yield y_coord*width + x_coord
+
+def _numpy_counts(np, x, y, x_min, x_max, y_min, y_max, width, height):
+    # The number of points in each cell, as a height by width array. x is None
+    # for the array indices.
+    counts = np.zeros(width*height, dtype=np.intp)
+    for cells in _numpy_cells(np, x, y, x_min, x_max, y_min, y_max, width, height):
+        counts += np.bincount(cells, minlength=width*height)
+    return counts.reshape(height, width)
+
+def _numpy_bin(np, x, y, x_min, x_max, y_min, y_max, width, height, stem=False):
+    # The same canvas as plot's loop over the points, made by binning the
+    # points with NumPy.
+    counts = _numpy_counts(np, x, y, x_min, x_max, y_min, y_max, width, height)
+    if stem:
+        y_range = y_max - y_min
+        # _fill_stems for the whole canvas at once
+        landed = counts > 0
+        filled = landed.any(axis=0)
+        if filled.any():
+            y_0_coord = _stem_base(y_min, y_range, height)
+            lowest = np.minimum(landed.argmax(axis=0), y_0_coord)
+            highest = np.maximum(height-1 - landed[::-1].argmax(axis=0), y_0_coord)
+            rows = np.arange(height)[:, None]
+            counts += filled & (lowest <= rows) & (rows <= highest)
+    return [bytearray(row.tobytes()) for row in np.minimum(counts, 2).astype(np.uint8)]
+
+def _stem_base(y_min, y_range, height):
+    # The row that stems start from, where y=0 is (which can be off the plot).
+    return int(round(-y_min/(y_range*1.0)*(height-1)))
+
+def _fill_stems(arr, y_min, y_range):
+    # Shades under the points for stem. A stem covers the cells from y=0 to
+    # its point, so each column is covered from y=0 to its farthest point
+    # either way. Every covered cell gets 1 more than the number of points
+    # in it, so that a point shows as '#' and the rest of the stem as '*'.
+    height = len(arr)
+    y_0_coord = None
+    for col in range(len(arr[0])):
+        landed = [i for i in range(height) if arr[i][col]]
+        if not landed:
+            continue
+        if y_0_coord is None:
+            y_0_coord = _stem_base(y_min, y_range, height)
+        for i in range(max(0, min(y_0_coord, landed[0])), min(height-1, max(y_0_coord, landed[-1]))+1):
+            arr[i][col] += 1
+
+def _fill_envelope(arr):
+    # Fills in each column of a decimated canvas from its lowest point to its
+    # highest, so that the column shows the band its points cover, like the
+    # full plot does, rather than just its edges. Cells that already have
+    # points (or stems) are left as they are.
+    height = len(arr)
+    for col in range(len(arr[0])):
+        landed = [i for i in range(height) if arr[i][col]]
+        if not landed:
+            continue
+        for i in range(landed[0]+1, landed[-1]):
+            if not arr[i][col]:
+                arr[i][col] = 1
+
+def _pairs(x, y):
+    # Yields plot's (x, y) points one at a time without needing len() or
+    # indexing, so x and y can be iterators. Doesn't use zip because it makes
+    # a list in Python 2.
+    if y is not None:
+        y = iter(y)
+        for x_pos in x:
+            try:
+                y_pos = next(y)
+            except StopIteration:
+                return
+            yield x_pos, y_pos
+        return
+    x = iter(x)
+    try:
+        first = next(x)
+    except StopIteration:
+        return
+    if hasattr(first, '__len__'):
+        yield first[0], first[1]
+        for point in x:
+            yield point[0], point[1]
+    else:
+        yield 0, first
+        i = 1
+        for y_pos in x:
+            yield i, y_pos
+            i += 1
+
+def _keep_extremes(lows, highs, col, x_pos, y_pos):
+    # Makes (y_pos, x_pos) column col's lowest or highest point if it is.
+    if lows[col] is None:
+        lows[col] = highs[col] = (y_pos, x_pos)
+    elif y_pos < lows[col][0]:
+        lows[col] = (y_pos, x_pos)
+    elif y_pos > highs[col][0]:
+        highs[col] = (y_pos, x_pos)
+
+def _keep_limits(limits, a_min, a_max):
+    # Updates limits, [min, max] of the values so far, with the min and max of
+    # the next values, the way min() and max() would.
+    if limits[0] is None:
+        limits[0], limits[1] = a_min, a_max
+    elif a_min < limits[0]:
+        limits[0] = a_min
+    if a_max > limits[1]:
+        limits[1] = a_max
+
+def _numpy_extremes(np, x, y, x_min, x_max, y_lo, y_hi, lows, highs, y_limits):
+    # _decimate's loop for NumPy arrays, a chunk at a time.
+    width = len(lows)
+    x_range = x_max - x_min
+    n = len(y) if x is None else min(len(x), len(y))
+    for start in range(0, n, _NUMPY_CHUNK):
+        stop = min(start+_NUMPY_CHUNK, n)
+        y_pos = _numpy_chunk(np, y, start, stop)
+        if x is None:
+            x_pos = np.arange(start, stop)
+        else:
+            x_pos = _numpy_chunk(np, x, start, stop)
+        # min() and max() only notice NaNs at the very start
+        numbers = y_pos if start == 0 or y.dtype.kind != 'f' else y_pos[~np.isnan(y_pos)]
+        if len(numbers):
+            _keep_limits(y_limits, *_numpy_min_max(np, numbers))
+        keep = (x_min <= x_pos) & (x_pos <= x_max) & (y_lo <= y_pos) & (y_pos <= y_hi)
+        x_pos = x_pos[keep]
+        y_pos = y_pos[keep]
+        if len(y_pos) == 0:
+            continue
+        cols = _numpy_round(np, (x_pos - x_min)/(x_range*1.0)*(width-1))
+        # sort by column, then y, so each column's lowest and highest points
+        # are at the ends of its run
+        order = np.lexsort((y_pos, cols))
+        cols = cols[order]
+        firsts = np.flatnonzero(np.concatenate(([True], cols[1:] != cols[:-1])))
+        lasts = np.concatenate((firsts[1:], [len(cols)])) - 1
+        for first, last in zip(firsts.tolist(), lasts.tolist()):
+            col = int(cols[first])
+            for i in (order[first], order[last]):
+                _keep_extremes(lows, highs, col, x_pos[i], y_pos[i])
+
+def _decimate(x, y, xlim, ylim, width):
+    # Reduces plot's points to the lowest and highest point in each column,
+    # in one pass that keeps at most 2*width points. plot fills in the
+    # columns between them with _fill_envelope. x and y can be
+    # iterators if xlim is given. Returns lists of the kept x and y values,
+    # and xlim and ylim with the data's limits filled in, so that the axes
+    # are the same as without decimating.
+    np, x, y = _numpy_points(x, y)
+    x_min, x_max = (None, None) if xlim is None else xlim
+    if x_min is None or x_max is None:
+        if np is not None:
+            data_min, data_max = (0, len(y)-1) if x is None else _numpy_limits(np, x)
+        elif not hasattr(x, '__len__'):
+            raise ValueError('plot needs xlim to decimate an iterator')
+        elif y is not None:
+            data_min, data_max = min(x), max(x)
+        elif not hasattr(x[0], '__len__'):
+            data_min, data_max = 0, len(x)-1
+        else:
+            data_min = min(point[0] for point in x)
+            data_max = max(point[0] for point in x)
+        x_min = data_min if x_min is None else x_min
+        x_max = data_max if x_max is None else x_max
+    # points outside ylim are left out, like plot does
+    y_lo, y_hi = (None, None) if ylim is None else ylim
+    y_lo = -float('inf') if y_lo is None else y_lo
+    y_hi = float('inf') if y_hi is None else y_hi
+    lows = [None]*width
+    highs = [None]*width
+    y_limits = [None, None]
+    if np is not None and x_max == x_min:
+        # fall back to the loop, like _canvas
+        np = None
+    if np is not None:
+        _numpy_extremes(np, x, y, x_min, x_max, y_lo, y_hi, lows, highs, y_limits)
+    else:
+        x_range = x_max - x_min
+        for x_pos, y_pos in (enumerate(y) if x is None else _pairs(x, y)):
+            _keep_limits(y_limits, y_pos, y_pos)
+            if not ((x_min <= x_pos and x_pos <= x_max) and (y_lo <= y_pos and y_pos <= y_hi)):
+                continue
+            col = int(round((x_pos - x_min)/(x_range*1.0)*(width-1)))
+            _keep_extremes(lows, highs, col, x_pos, y_pos)
+    if ylim is not None:
+        y_limits = [y_limits[i] if ylim[i] is None else ylim[i] for i in (0, 1)]
+    x, y = [], []
+    for low, high in zip(lows, highs):
+        if low is None:
+            continue
+        for y_pos, x_pos in ((low,) if low is high else (low, high)):
+            x.append(x_pos)
+            y.append(y_pos)
+    return x, y, (x_min, x_max), tuple(y_limits)
+
+def _limits(lim, np, values, count=None):
+    # lim with any missing ends filled in with the min or max of values,
+    # which is None for the indices 0 to count-1.
+    low, high = (None, None) if lim is None else lim
+    if low is None or high is None:
+        if values is None:
+            data_min, data_max = 0, count-1
+        elif np is not None:
+            data_min, data_max = _numpy_limits(np, values)
+        elif not hasattr(values, '__len__'):
+            raise ValueError('plot needs xlim and ylim for an iterator')
+        else:
+            data_min, data_max = min(values), max(values)
+        low = data_min if low is None else low
+        high = data_max if high is None else high
+    return low, high
+
+def _ramp_levels(counts, log):
+    # Turns rows of counts into bytearray rows of levels from 0 (no points)
+    # to _RAMP_STEPS (the most points in a cell). thresholds[k] is the
+    # most points that get level k.
+    top = max([max(row) for row in counts])
+    if log:
+        # ** instead of math.log, so there's nothing to import
+        thresholds = [(1.0+top)**(k*1.0/_RAMP_STEPS) - 1 for k in range(_RAMP_STEPS+1)]
+    else:
+        thresholds = [top*k*1.0/_RAMP_STEPS for k in range(_RAMP_STEPS+1)]
+    thresholds[0] = 0
+    thresholds[-1] = top
+    np = _numpy_module(counts)
+    if np is not None:
+        levels = np.searchsorted(thresholds, counts).astype(np.uint8)
+        return [bytearray(row.tobytes()) for row in levels]
+    known = {0: 0}
+    rows = []
+    for row in counts:
+        levels = bytearray(len(row))
+        for i, count in enumerate(row):
+            level = known.get(count)
+            if level is None:
+                level = 1
+                while count > thresholds[level]:
+                    level += 1
+                known[count] = level
+            levels[i] = level
+        rows.append(levels)
+    return rows
+
+def _density(x, y, xlim, ylim, width, height, log):
+    # Counts the points in each cell for plot's density mode, in one pass
+    # that only keeps the counts. Returns the rows of levels (see
+    # _ramp_levels), and xlim and ylim with the data's limits filled in.
+    np, x, y = _numpy_points(x, y)
+    if np is None and y is None and hasattr(x, '__len__'):
+        if not hasattr(x[0], '__len__'):
+            x, y = None, x
+        else:
+            x, y = zip(*x) # unzip list of tuples
+    if y is None:
+        # an iterator, of tuples or of y values
+        if xlim is None or None in xlim or ylim is None or None in ylim:
+            raise ValueError('plot needs xlim and ylim for an iterator')
+    else:
+        xlim = _limits(xlim, np, x, len(y) if x is None else None)
+        ylim = _limits(ylim, np, y)
+    (x_min, x_max), (y_min, y_max) = xlim, ylim
+    if np is not None and (x_max == x_min or y_max == y_min):
+        # fall back to the loop, like _canvas
+        np = None
+    if np is not None:
+        counts = _numpy_counts(np, x, y, x_min, x_max, y_min, y_max, width, height)
+    else:
+        x_range = x_max - x_min
+        y_range = y_max - y_min
+        counts = [[0]*width for _ in range(height)]
+        points = enumerate(y) if x is None else _pairs(x, y)
+        for x_pos, y_pos in points:
+            if not ((x_min <= x_pos and x_pos <= x_max) and (y_min <= y_pos and y_pos <= y_max)):
+                continue
+            x_coord = int(round((x_pos - x_min)/(x_range*1.0)*(width-1)))
+            y_coord = int(round((y_pos - y_min)/(y_range*1.0)*(height-1)))
+            counts[y_coord][x_coord] += 1
+    return _ramp_levels(counts, log), xlim, ylim
+
+def _points(x, y):
+    # we want:
+    # x = [x1, x2, ...], y=[y1, y2, ...]
+    # but will also accept:
+    # x = [y1, y2, y3, y4, ...]
+    # x = [(x1,y1), (x2,y2), ...]
+    # or NumPy arrays like those.
+    # Returns (numpy, x, y), where numpy is None unless they're NumPy arrays
+    # and x is None for the indices, which are counted off as they're needed
+    # rather than made into a list. An iterator x (with y None) is left as it
+    # is, for _canvas.
+    np, x, y = _numpy_points(x, y)
+    if np is None and y is None and hasattr(x, '__len__'):
+        if not hasattr(x[0], '__len__'):
+            x, y = None, x
+        else:
+            x, y = zip(*x) # unzip list of tuples
+            x, y = list(x), list(y)
+    return np, x, y
+
+def _canvas(np, x, y, x_min, x_max, y_min, y_max, width, height, stem):
+    # we want a list in the form list[y][x], where each row is a bytearray
+    # of the number of points in each cell, which stops counting at 2
+    x_range = x_max - x_min
+    y_range = y_max - y_min
+    if np is not None and (x_range == 0 or y_range == 0):
+        # fall back to the loop, which handles these
+        np = None
+    if np is not None:
+        return _numpy_bin(np, x, y, x_min, x_max, y_min, y_max, width, height, stem)
+    arr = [bytearray(width) for _ in range(height)]
+    if x is None:
+        points = enumerate(y)
+    else:
+        points = _pairs(x, y) if y is None else zip(x, y)
+    for x_pos, y_pos in points:
+        # in older Python versions, round always returns a floating point value
+        # so we cast to int
+        if not ((x_min <= x_pos and x_pos <= x_max) and (y_min <= y_pos and y_pos <= y_max)):
+            continue
+        x_coord = int(round((x_pos - x_min)/(x_range*1.0)*(width-1)))
+        y_coord = int(round((y_pos - y_min)/(y_range*1.0)*(height-1)))
+        row = arr[y_coord]
+        if row[x_coord] < 2:
+            row[x_coord] += 1
+    if stem:
+        _fill_stems(arr, y_min, y_range)
+    return arr
+
+# Markers for the series of a plot of several, in order. '#' is where more
+# than one series has points.
+_SERIES_MARKERS = '*o+x@%&$=~'
+
+def _series_marks(n):
+    # Translates a canvas drawn by _draw_series to markers.
+    marks = bytearray(b' ' + b'#'*255)
+    for k in range(min(n, 254)):
+        marks[k+1] = ord(_SERIES_MARKERS[k % len(_SERIES_MARKERS)])
+    return marks
+
+def _series_points(data):
+    # One of plot's series as (numpy, x, y) (see _points). data is an (x, y)
+    # tuple, or anything plot takes as x on its own.
+    if isinstance(data, tuple) and len(data) == 2:
+        return _points(data[0], data[1])
+    return _points(data, None)
+
+def _pair_limits(points):
+    # ((x_min, x_max), (y_min, y_max)) of (x, y) points in one pass, the way
+    # min() and max() would find them, or None if there aren't any.
+    points = iter(points)
+    for x_min, y_min in points:
+        break
+    else:
+        return None
+    x_max, y_max = x_min, y_min
+    for x_pos, y_pos in points:
+        if x_pos < x_min:
+            x_min = x_pos
+        elif x_pos > x_max:
+            x_max = x_pos
+        if y_pos < y_min:
+            y_min = y_pos
+        elif y_pos > y_max:
+            y_max = y_pos
+    return (x_min, x_max), (y_min, y_max)
+
+def _shared_limits(xlim, ylim, series):
+    # xlim and ylim with any missing ends filled in from the data of every
+    # series, in one pass over each series (a chunk at a time for NumPy
+    # arrays, and a line at a time for a ColumnFile).
+    lims = [(None, None) if xlim is None else xlim, (None, None) if ylim is None else ylim]
+    need = [None in lim for lim in lims]
+    if not (need[0] or need[1]):
+        return tuple(lims[0]), tuple(lims[1])
+    limits = [[None, None], [None, None]]
+    for np, x, y in series:
+        if np is not None:
+            if need[0]:
+                _keep_limits(limits[0], *((0, len(y)-1) if x is None else _numpy_limits(np, x)))
+            if need[1]:
+                _keep_limits(limits[1], *_numpy_limits(np, y))
+            continue
+        if isinstance(x, ColumnFile):
+            found = x.limits()
+        elif x is not None and not hasattr(x, '__len__'):
+            raise ValueError('plot needs xlim and ylim for an iterator')
+        else:
+            found = _pair_limits(enumerate(y) if x is None else _pairs(x, y))
+        if found is not None:
+            for i in (0, 1):
+                _keep_limits(limits[i], *found[i])
+    out = []
+    for (low, high), found in zip(lims, limits):
+        out.append((found[0] if low is None else low, found[1] if high is None else high))
+    if None in out[0] or None in out[1]:
+        raise ValueError('plot needs xlim and ylim when no series has any points')
+    return out[0], out[1]
+
+def _point_cells(points, x_min, x_max, y_min, y_max, width, height):
+    # Yields the cell (row*width + column) of each point inside the limits.
+    x_range = x_max - x_min
+    y_range = y_max - y_min
+    for x_pos, y_pos in points:
+        if not ((x_min <= x_pos and x_pos <= x_max) and (y_min <= y_pos and y_pos <= y_max)):
+            continue
+        x_coord = int(round((x_pos - x_min)/(x_range*1.0)*(width-1)))
+        y_coord = int(round((y_pos - y_min)/(y_range*1.0)*(height-1)))
+        yield y_coord*width + x_coord
+
+def _draw_series(arr, k, np, x, y, x_min, x_max, y_min, y_max, stem):
+    # Draws series k of a plot of several straight onto the shared canvas
+    # arr, where each cell is 0 if it's empty, k+1 if only series k has points
+    # (or stems) there, and 255 if more than one does. With stem, only each
+    # column's lowest and highest point are kept to work out its stem.
+    height = len(arr)
+    width = len(arr[0])
+    if np is not None and (x_max == x_min or y_max == y_min):
+        # fall back to the loop, like _canvas
+        np = None
+    if np is not None:
+        cells = (cell for chunk in _numpy_cells(np, x, y, x_min, x_max, y_min, y_max, width, height)
+                 for cell in np.unique(chunk).tolist())
+    else:
+        cells = _point_cells(enumerate(y) if x is None else _pairs(x, y), x_min, x_max, y_min, y_max, width, height)
+    mark = k+1
+    lows = [height]*width
+    highs = [-1]*width
+    for cell in cells:
+        i, col = divmod(cell, width)
+        row = arr[i]
+        if row[col] != mark:
+            row[col] = 255 if row[col] else mark
+        if i < lows[col]:
+            lows[col] = i
+        if i > highs[col]:
+            highs[col] = i
+    if not stem:
+        return
+    y_0_coord = None
+    for col in range(width):
+        if highs[col] < 0:
+            continue
+        if y_0_coord is None:
+            y_0_coord = _stem_base(y_min, y_max - y_min, height)
+        for i in range(max(0, min(y_0_coord, lows[col])), min(height-1, max(y_0_coord, highs[col]))+1):
+            row = arr[i]
+            if row[col] != mark:
+                row[col] = 255 if row[col] else mark
+
+class ColumnFile(object):
+    '''
+    The numbers in a column (or two) of a text file, like a CSV file or a log
+    with columns separated by spaces, read a line at a time every time it's
+    looped over, so plot and the bar charts can show files far too big to
+    load, ie
+    >>> plot(ColumnFile('log.csv', 2, delimiter=','), density='log')
+    >>> plot(ColumnFile('log.txt', 1, x_column=0), decimate=True)
+    >>> horizontal_bar_chart(ColumnFile('counts.txt'))
+    Looping over it yields the y values, or (x, y) tuples if x_column is
+    given, which plot treats like a list of them, but only one line of the
+    file is kept at a time. plot (in any mode) and the bar charts find any
+    limits you don't give them with an extra pass over the file. Lines
+    where the columns aren't numbers (like headers and comments) are skipped.
+
+    path: The file's path.
+    column: The index of the column of y values, from 0.
+    x_column: None, or the index of the column of x values. If None, the x
+              values are 0, 1, 2, ... for the lines that aren't skipped.
+              Bar charts only use y values, so leave it out for them.
+    delimiter: None to split columns on whitespace, otherwise the text
+               between columns, like ','.
+    '''
+    def __init__(self, path, column=0, x_column=None, delimiter=None):
+        self.path = path
+        self.column = column
+        self.x_column = x_column
+        self.delimiter = delimiter
+    def __iter__(self):
+        f = open(self.path)
+        try:
+            for line in f:
+                cells = line.split(self.delimiter)
+                try:
+                    y = float(cells[self.column])
+                    if self.x_column is not None:
+                        x = float(cells[self.x_column])
+                except (ValueError, IndexError):
+                    continue
+                if self.x_column is None:
+                    yield y
+                else:
+                    yield x, y
+        finally:
+            f.close()
+    def limits(self):
+        # ((x_min, x_max), (y_min, y_max)) of the file, in one pass, the way
+        # min() and max() would find them.
+        x_limits = [None, None]
+        y_limits = [None, None]
+        count = 0
+        for point in self:
+            if self.x_column is None:
+                _keep_limits(y_limits, point, point)
+            else:
+                _keep_limits(x_limits, point[0], point[0])
+                _keep_limits(y_limits, point[1], point[1])
+            count += 1
+        if count == 0:
+            raise ValueError('%s has no numbers in column %d' % (self.path, self.column))
+        if self.x_column is None:
+            x_limits = [0, count-1]
+        return tuple(x_limits), tuple(y_limits)
+
+def _file_limits(data, xlim, ylim):
+    # xlim and ylim with any missing ends filled in from data if it's a
+    # ColumnFile, otherwise as given.
+    if not isinstance(data, ColumnFile):
+        return xlim, ylim
+    lims = [xlim, ylim]
+    if any(lim is None or None in lim for lim in lims):
+        found = data.limits()
+        for i in (0, 1):
+            low, high = (None, None) if lims[i] is None else lims[i]
+            lims[i] = (found[i][0] if low is None else low,
+                       found[i][1] if high is None else high)
+    return lims[0], lims[1]
+
+def map_array(path, dtype='float64', columns=None, offset=0):
+    '''
+    A read-only NumPy array of the numbers in a binary file, memory-mapped,
+    so the file is only read from disk as it's used, ie
+    >>> plot(map_array('capture.npy'), density='log')
+    >>> plot(map_array('capture.i16', 'int16'), decimate=True)
+    plot and the bar charts go through NumPy arrays a chunk at a time, so
+    they only need a chunk of the file in memory at once, however big it is.
+    They use NumPy for int and float arrays (a chunk of float32 or float16
+    numbers is turned into float64 first), and go a point at a time (which is
+    much slower) for other types. Needs NumPy, which is only imported when
+    this is called.
+
+    path: The file's path. A .npy file has its own dtype and shape, which
+          are used instead of the other arguments, otherwise it's raw numbers.
+    dtype: The type of the numbers, like 'float64', 'int16' or '<u2'.
+    columns: None for a list of numbers, otherwise the numbers in each row,
+             so columns=2 gives the (n,2) array of (x, y) points that plot
+             takes. Any numbers left over at the end are left out.
+    offset: The number of bytes to skip at the start of the file, like a
+            header.
+    '''
+    import numpy
+    if path.endswith('.npy'):
+        return numpy.load(path, mmap_mode='r')
+    a = numpy.memmap(path, dtype=dtype, mode='r', offset=offset)
+    if columns is not None:
+        a = a[:len(a)//columns*columns].reshape(-1, columns)
+    return a
+
+def _bar_data(x, y):
+    # horizontal_bar_chart's (first index, values, labels or None).
+    if y is None:
+        return 0, x, None
+    if not hasattr(y, '__iter__'):
+        return y, x, None
+    return 0, y, x
+
+def _count(start):
+    # start, start+1, ... as strs, the labels of an unlabeled bar chart.
+    while True:
+        yield str(start)
+        start += 1
+
+# horizontal_bar_chart's value labels, and number labels where there's room.
+_value_label = _make_formatter(12)
+_number_label = _make_formatter(15, align='right')
+# The lines horizontal_bar_chart makes at a time.
+_BAR_PAGE_SIZE = 1024
+
+def _bar_line(label, v, index_length, increment, negative):
+    # One line of horizontal_bar_chart. label is a str for indices,
+    # otherwise the label as given.
+    val = int(v/increment)
+    if negative:
+        val = -val
+    if isinstance(label, str):
+        out = label[:15]
+    elif index_length == 15:
+        out = _number_label(label)
+    else:
+        out = str(label)[:15]
+    return out.rjust(index_length, ' ') + '|' + '*'*val + ' ' + _value_label(v)
+
 def horizontal_bar_chart(x, y=None, dummy_arg=_dummy, width=None, return_text=False):
     '''
     This function makes a horizontal bar chart using plain text, ie
@@ -277,15 +1093,18 @@ def horizontal_bar_chart(x, y=None, dummy_arg=_dummy, width=None, return_text=Fa
     '''
     if dummy_arg is not _dummy: # Python 2 compatible
         raise TypeError('horizontal_bar_chart takes 1-2 positional arguments but 3 were given.')
-    start = 0
-    values = x
-    labels = None
-    if y is not None:
-        if not hasattr(y, '__len__'):
-            start = y
-        else:
-            values = y
-            labels = x
+    start, values, labels = _bar_data(x, y)
+    if isinstance(values, ColumnFile):
+        # printed a page at a time as it's read
+        pages = horizontal_bar_chart_pages(x, y, width=width)
+        if return_text:
+            return ''.join([page + '\n' for page in pages])
+        for page in pages:
+            print(page)
+        return None
+    # Only the limits and the label width need the whole of the data. The
+    # lines are made (and printed) a page at a time, so a memory-mapped
+    # array is never all in memory.
     if labels is not None:
         index_length = len(str(max(labels, key=lambda x: len(str(x)))))
         index_length = min(index_length, 15)
@@ -296,29 +1115,100 @@ def horizontal_bar_chart(x, y=None, dummy_arg=_dummy, width=None, return_text=Fa
             width = os.get_terminal_size()[0]-16-15-index_length
         except:
             width = 50
-    min_val = min(values)
-    max_val = max(values)
-    increment = max(abs(max_val), abs(min_val))/(1.0*width)
-    text = ''
-    for i, v in zip(range(len(values)), values):
-        val = int(v/increment)
-        if max_val <= 0:
-            val = -val
-        if labels is not None:
-            out = str(labels[i])[:15]
-            if index_length == 15 and not isinstance(labels[i], str):
-                out = _round_to_width(labels[i], 15, align='right')
-            out = out.rjust(index_length, ' ')
-        else:
-            out = str(i+start).rjust(index_length, ' ')
-        out += '|' + '*'*val + ' ' + _round_to_width(v, 12)
-        text += out + '\n'
+    np = _numpy_module(values)
+    if np is not None and values.ndim == 1:
+        # a chunk at a time, for memory-mapped arrays
+        min_val, max_val = _numpy_limits(np, values)
+    else:
+        min_val = min(values)
+        max_val = max(values)
+    pages = horizontal_bar_chart_pages(x, y, width=width, limits=(min_val, max_val),
+                                       label_width=index_length, page_size=_BAR_PAGE_SIZE)
     if return_text:
-        return text
-    print(text[:-1])
+        return ''.join([page + '\n' for page in pages])
+    for page in pages:
+        print(page)
     return None
 
-def plot(x, y=None, dummy_arg=_dummy, width=None, height=None, stem=False, return_text=False, xlim=None, ylim=None):
+def horizontal_bar_chart_pages(x, y=None, dummy_arg=_dummy, width=None, limits=None, label_width=None, page_size=None):
+    '''
+    A lazy horizontal_bar_chart, for skimming through arrays that are too
+    big to wait for the whole chart. It's a generator of pages of the chart,
+    which are made as they're asked for, ie
+    >>> for page in horizontal_bar_chart_pages(big_array, page_size=40):
+    ...     print(page)
+    ...     input() # or raw_input() in Python 2
+
+    x, y, width: The same as horizontal_bar_chart's, except that x and y can
+                 be iterators (like generators or files) if limits is given.
+    limits: None or a tuple (or equivalent) in the form (min, max) of the
+            values, which the bars are scaled to. Any values that are None
+            are found with a first pass over the values, which is much
+            quicker than making the chart.
+    label_width: The width of the labels. If None, it's the widest label in
+                 each page (at most 15) if there are labels, and the widest
+                 index if there aren't.
+    page_size: The number of lines in each page. 1 gives the chart a line at
+               a time. If None, it's the terminal's height, otherwise 24.
+    '''
+    if dummy_arg is not _dummy: # Python 2 compatible
+        raise TypeError('horizontal_bar_chart_pages takes 1-2 positional arguments but 3 were given.')
+    start, values, labels = _bar_data(x, y)
+    sized = hasattr(values, '__len__')
+    min_val, max_val = (None, None) if limits is None else limits
+    if min_val is None or max_val is None:
+        np = _numpy_module(values)
+        if isinstance(values, ColumnFile):
+            data_min, data_max = values.limits()[1]
+        elif not sized:
+            raise ValueError('horizontal_bar_chart_pages needs limits for an iterator')
+        elif np is not None and values.ndim == 1:
+            data_min, data_max = _numpy_limits(np, values)
+        else:
+            data_min, data_max = min(values), max(values)
+        min_val = data_min if min_val is None else min_val
+        max_val = data_max if max_val is None else max_val
+    index_length = label_width
+    if index_length is None and labels is None and sized:
+        index_length = max(len(str(start)), len(str(len(values)+start)))
+    if width is None:
+        try:
+            width = os.get_terminal_size()[0]-16-15-(15 if index_length is None else index_length)
+        except:
+            width = 50
+    if page_size is None:
+        try:
+            page_size = os.get_terminal_size()[1]
+        except:
+            page_size = 24
+    increment = max(abs(max_val), abs(min_val))/(1.0*width)
+    negative = max_val <= 0
+    indexed = labels is None
+    if indexed:
+        labels = _count(start)
+    points = _pairs(labels, values)
+    while True:
+        # format a page's labels in one go
+        page = []
+        for point in points:
+            page.append(point)
+            if len(page) == page_size:
+                break
+        if not page:
+            return
+        if index_length is not None:
+            page_length = index_length
+        elif indexed:
+            page_length = max(len(str(start)), len(page[-1][0]))
+        else:
+            page_length = min(max([len(str(label)) for label, v in page]), 15)
+        yield '\n'.join([_bar_line(label, v, page_length, increment, negative) for label, v in page])
+
+# plot's y axis and x axis labels.
+_y_label = _make_formatter(8)
+_x_label = _make_formatter(7)
+
+def plot(x, y=None, dummy_arg=_dummy, width=None, height=None, stem=False, return_text=False, xlim=None, ylim=None, decimate=False, density=None):
     '''
     This function makes a plot using plain text, ie
     >>> plot([math.cos(i*.5) for i in range(41)], width=40, height=9)
@@ -342,6 +1232,16 @@ def plot(x, y=None, dummy_arg=_dummy, width=None, height=None, stem=False, retur
        indices as their x values.
        If y is present, then x and y are treated as the lists
        [x1, x2, ...], [y1, y2, ...]
+       x can also be an iterator (like a generator) if xlim and ylim are
+       given, or a ColumnFile or map_array of a file that's too big to load,
+       which is read a line or a chunk at a time.
+       x can also be a dict of several series to plot together, like
+       {'cos': cos_values, 'sin': (x, sin_values)}, where each is either an
+       (x, y) tuple or anything x can be on its own. They share the axes and
+       each gets its own marker ('*', 'o', '+', 'x', ...) in the order of the
+       dict (use an OrderedDict in Python 2), with '#' where they overlap,
+       and a legend at the bottom. decimate and density don't work with
+       several series.
     width: None or a positive integer. The number of columns in the plot box.
     height: None or a positive integer. The number of rows in the plot box.
         If width or height are missing, this function tries to auto-size the
@@ -355,10 +1255,23 @@ def plot(x, y=None, dummy_arg=_dummy, width=None, height=None, stem=False, retur
           upper and lower bounds for the x-axis. Any values that are None will
           be auto-detected from the data.
     ylim: Same as xlim, but for the y-axis.
+    decimate: If True, the points are first reduced to the lowest and highest
+              point in each column, in one pass that only keeps those, which
+              is much faster and uses much less memory when there are far
+              more points than columns. Each column is filled in from its
+              lowest point to its highest, a min/max envelope of the points
+              rather than every point. x and y can also be iterators (like
+              generators or files) if xlim is given.
+    density: None, 'linear' or 'log'. If given, each cell shows how many points
+             are in it, from ' ' for none through '.:-=+*#%' to '@' for the
+             most, scaled linearly or logarithmically. The points are counted
+             in one pass (a chunk at a time for NumPy arrays, including
+             memory-mapped ones from numpy.load(path, mmap_mode='r')), keeping
+             only the counts, so x and y can be iterators if xlim and ylim
+             are both given. stem and decimate are ignored.
     '''
     if dummy_arg is not _dummy: # Python 2 compatible
         raise TypeError('plot takes 1-2 positional arguments but 3 were given.')
-    text = ''
     if height is None:
         try:
             height = os.get_terminal_size()[1]-4
@@ -371,67 +1284,49 @@ def plot(x, y=None, dummy_arg=_dummy, width=None, height=None, stem=False, retur
             width = 69
         if width <= 10:
             height -= 2
-    # we want:
-    # x = [x1, x2, ...], y=[y1, y2, ...]
-    # but will also accept:
-    # x = [y1, y2, y3, y4, ...]
-    # x = [(x1,y1), (x2,y2), ...]
-    if y is None:
-        if not hasattr(x[0], '__len__'):
-            y = x
-            x = list(range(len(y)))
-        else:
-            x, y = zip(*x) # unzip list of tuples
-            x, y = list(x), list(y)
-    x_min, x_max = min(x), max(x)
-    if xlim is not None:
-        if xlim[0] is not None:
-            x_min = xlim[0]
-        if xlim[1] is not None:
-            x_max = xlim[1]
+    arr = None
+    marks = _MARKS
+    legend = None
+    if isinstance(x, dict):
+        if not x:
+            raise ValueError('plot needs at least one series')
+        names = list(x)
+        series = [_series_points(x[name]) for name in names]
+        (x_min, x_max), (y_min, y_max) = _shared_limits(xlim, ylim, series)
+        arr = [bytearray(width) for _ in range(height)]
+        for k, (np, s_x, s_y) in enumerate(series):
+            _draw_series(arr, k, np, s_x, s_y, x_min, x_max, y_min, y_max, stem)
+        marks = _series_marks(len(series))
+        legend = '  '.join([chr(marks[k+1]) + ' ' + str(name) for k, name in enumerate(names)])
+    else:
+        xlim, ylim = _file_limits(x, xlim, ylim)
+        if density is not None:
+            arr, xlim, ylim = _density(x, y, xlim, ylim, width, height, density == 'log')
+            x, y = [], []
+            marks = _RAMP
+        elif decimate:
+            x, y, xlim, ylim = _decimate(x, y, xlim, ylim, width)
+        elif not hasattr(x, '__len__') and (xlim is None or None in xlim or ylim is None or None in ylim):
+            raise ValueError('plot needs xlim and ylim for an iterator')
+        np, x, y = _points(x, y)
+        # the data's limits are only needed where xlim or ylim doesn't give them
+        x_min, x_max = _limits(xlim, np, x, len(y) if x is None else None)
+        y_min, y_max = _limits(ylim, np, y)
+        if arr is None:
+            arr = _canvas(np, x, y, x_min, x_max, y_min, y_max, width, height, stem)
+            if decimate:
+                _fill_envelope(arr)
     x_range = x_max - x_min
-    y_min, y_max = min(y), max(y)
-    if ylim is not None:
-        if ylim[0] is not None:
-            y_min = ylim[0]
-        if ylim[1] is not None:
-            y_max = ylim[1]
     y_range = y_max - y_min
-    # we want a list in the form list[y][x]
-    arr = [[0]*width for _ in range(height)]
-    print(x_min, x_max)
-    print(y_min, y_max)
-    for x_pos, y_pos in zip(x, y):
-        # in older Python versions, round always returns a floating point value
-        # so we cast to int
-        if not ((x_min <= x_pos and x_pos <= x_max) and (y_min <= y_pos and y_pos <= y_max)):
-            continue
-        x_coord = int(round((x_pos - x_min)/(x_range*1.0)*(width-1)))
-        y_coord = int(round((y_pos - y_min)/(y_range*1.0)*(height-1)))
-        if stem:
-            y_0_coord = int(round(-y_min/(y_range*1.0)*(height-1)))
-            between = lambda i: (y_0_coord <= i and i <= y_coord) or (y_coord <= i and i <= y_0_coord)
-            for i in filter(between, range(0, height)):
-                arr[i][x_coord] = max(arr[i][x_coord], 1)
-        arr[y_coord][x_coord] += 1
     # print('_'*(width+2), _round_to_width(y_max, 8))
-    text += '_'*(width+2) + ' ' + _round_to_width(y_max, 8) + '\n'
+    lines = ['_'*(width+2) + ' ' + _y_label(y_max)]
     for i in range(len(arr)):
         j = len(arr)-i-1
-        row = arr[j]
-        string = '|'
-        for count in row:
-            if count == 0:
-                string += ' '
-            elif count == 1:
-                string += '*'
-            else:
-                string += '#'
-        string += '|'
+        string = '|' + _ascii(arr[j].translate(marks)) + '|'
         if (i % 3 == 1):# or (i == len(arr)-1):
-            string += ' ' + _round_to_width(y_min + y_range * j/(1.0*len(arr)), 8)
+            string += ' ' + _y_label(y_min + y_range * j/(1.0*len(arr)))
         # print(string)
-        text += string + '\n'
+        lines.append(string)
     fractions = [0, 0.25, 0.5, 0.75, 1]
     if width <= 10:
         fractions = []
@@ -459,24 +1354,130 @@ def plot(x, y=None, dummy_arg=_dummy, width=None, height=None, stem=False, retur
         out[i] = '+'
         spots.append((i, fraction))
     # print(''.join(out))
-    text += ''.join(out) + '\n'
+    lines.append(''.join(out))
     if len(fractions) > 0:
-        out = _round_to_width(x_min, 7)
+        out = _x_label(x_min)
         prev = 5
         for i, fraction in spots[1:]:
             prev = len(out)
             out += ' '*(i-3-prev)
-            out += _round_to_width(x_min + fraction*x_range, 7)
+            out += _x_label(x_min + fraction*x_range)
         # print(out)
-        text += out
+        lines.append(out)
     else:
         # text += f'min x:{_round_to_width(x_min, 7)}\n'
-        text += 'min x:' + _round_to_width(x_min, 7) + '\n'
-        text += 'max x:' + _round_to_width(x_max, 7)
+        lines.append('min x:' + _x_label(x_min))
+        lines.append('max x:' + _x_label(x_max))
         # text += f'max x:{_round_to_width(x_max, 7)}'
         # print('min x:', _round_to_width(x_min, 7))
         # print('max x:', _round_to_width(x_max, 7))
+    if legend is not None:
+        lines.append(legend)
+    text = '\n'.join(lines)
     if return_text:
         return text + '\n'
     print(text)
     return None
+
+class LivePlot(object):
+    '''
+    A plot of the most recent points appended to it, which redraws itself in
+    place in the terminal, ie
+    >>> live = LivePlot(500, width=60, height=15)
+    >>> for value in readings():
+    ...     live.append(value)
+    >>> live.draw() # the last few points might not have been drawn yet
+
+    Only the lines of the plot that changed since the last frame get
+    rewritten (using ANSI escape codes to move the cursor), and it draws at
+    most fps frames per second however fast points are appended, so
+    watching a fast stream doesn't take much CPU. Anything else printed
+    while it's running will get in the way.
+
+    size: The number of points to keep. Older points are dropped.
+    fps: The most frames to draw per second. If None, every append draws.
+    stream: Where to draw, sys.stdout by default.
+    The rest of the arguments (width, height, stem, xlim, ylim, decimate)
+    are passed to plot.
+    '''
+    def __init__(self, size=1000, fps=10, stream=None, **plot_args):
+        self.size = size
+        self.fps = fps
+        self.stream = sys.stdout if stream is None else stream
+        self.plot_args = plot_args
+        # ring buffers, where the oldest point is at self.next once full
+        self.x = [None]*size
+        self.y = [None]*size
+        self.next = 0
+        self.count = 0 # points appended so far
+        self.lines = None # the last frame drawn
+        self.last_draw = None
+    def append(self, y, x=None):
+        # Adds a point, and draws a frame if one is due. If x isn't given,
+        # it's the number of points appended before this one.
+        if x is None:
+            x = self.count
+        self.x[self.next] = x
+        self.y[self.next] = y
+        self.next = (self.next + 1) % self.size
+        self.count += 1
+        self.update()
+    def extend(self, y, x=None):
+        if x is None:
+            for y_pos in y:
+                self.append(y_pos)
+        else:
+            for x_pos, y_pos in zip(x, y):
+                self.append(y_pos, x_pos)
+    def points(self):
+        # The x and y values being plotted, oldest first.
+        if self.count < self.size:
+            return self.x[:self.count], self.y[:self.count]
+        return (self.x[self.next:] + self.x[:self.next],
+                self.y[self.next:] + self.y[:self.next])
+    def update(self):
+        # Draws a frame if it's been at least 1/fps seconds since the last.
+        if self.fps is not None:
+            try:
+                now = time.time()
+            except:
+                now = None # no time module, so draw every frame
+            if now is not None:
+                if self.last_draw is not None and now - self.last_draw < 1.0/self.fps:
+                    return
+                self.last_draw = now
+        self.draw()
+    def draw(self):
+        # Draws a frame now, only rewriting the lines that changed.
+        if self.count == 0:
+            return
+        x, y = self.points()
+        plot_args = dict(self.plot_args)
+        for lim, values in (('xlim', x), ('ylim', y)):
+            if plot_args.get(lim) is None and min(values) == max(values):
+                # plot can't scale a single value, so give it some room
+                plot_args[lim] = (min(values) - 1, max(values) + 1)
+        text = plot(x, y, return_text=True, **plot_args)
+        lines = text.split('\n')[:-1]
+        old = self.lines
+        self.lines = lines
+        if old is None:
+            self.stream.write(text)
+        elif len(old) != len(lines):
+            # move up to the old frame and clear it and everything below it
+            self.stream.write('\x1b[%dA\r\x1b[J' % len(old) + text)
+        else:
+            out = ['\x1b[%dA\r' % len(old)]
+            skipped = 0
+            for old_line, line in zip(old, lines):
+                if old_line == line:
+                    skipped += 1
+                    continue
+                if skipped:
+                    out.append('\x1b[%dB' % skipped)
+                    skipped = 0
+                out.append('\x1b[2K' + line + '\n')
+            if skipped:
+                out.append('\x1b[%dB' % skipped)
+            self.stream.write(''.join(out))
+        self.stream.flush()
@@ -8,76 +8,501 @@
 # To decode:
 # python filename.py decode fruitbearing chansonnier factorable disproportionately pelota meselry brompicrin
 # The printed string is the encoded/decoded sentence
-import pandas as pd
+# To use the range codec, which usually needs fewer words, add --codec=range
+# after encode/decode (or --codec=huffman for the Huffman codec, or
+# --codec=bigram after training a bigram model on a file with one sentence per
+# line with: python filename.py bigram corpus.txt):
+# python filename.py encode --codec=range o that this too too solid flesh would melt
+# To encode/decode a whole file (or stdin, if there's no file or it's -) a bit
+# at a time, writing the output as it goes:
+# python filename.py encode-stream [--codec=range] words.txt > encoded.txt
+# python filename.py decode-stream [--codec=range] encoded.txt
+# To keep the model loaded and answer requests like 'encode some words' or
+# 'decode --codec=range some words', one per line, with a line of JSON each:
+# python filename.py serve [path to a Unix socket, otherwise stdin/stdout]
+# To cache every word's code in word_freqs.codebook, which encode then uses:
+# python filename.py codebook
+# To compile word_freqs.csv and words_alpha.txt into word_freqs.model, which
+# loads in a few milliseconds without pandas:
+# python filename.py compile
+import array
+import bisect
 import collections
+import contextlib
+import errno
+import functools
+import json
+import math
+import mmap
+import os
+import stat
+import struct
 import sys
 import time
+import zlib
 
 NUM_BITS = 18
 SIMPLE_WORDS = 2**NUM_BITS
+HUFFMAN_MAX_BITS = 32 # longest code the huffman codec uses
 
-# word_freqs.csv taken from https://github.com/harshnative/words-dataset
-freqs = pd.read_csv('word_freqs.csv').drop('index', axis=1).set_index('word')
-legal = pd.read_csv('words_alpha.txt', names=['word']) # https://websites.umich.edu/~jlawler/wordlist.html
-legal['word'] = legal['word'].str.lower()
-legal = legal.set_index('word')
-table = freqs.reset_index()
-legal = legal.reset_index()
-# We use ; as an EOF symbol with frequency assumed to be 1/25
-table.loc[len(table)] = ';', table['frequency'].sum()//24
-table = table.sort_values('frequency', ascending=False, ignore_index=True).loc[:SIMPLE_WORDS-2]
-temp = table['frequency']
-table['frequency'] = table['frequency'].cumsum()
-table['lower'] = table['frequency'] - temp
-table['lower'] /= table['frequency'].iloc[-1]
-table['frequency'] /= table['frequency'].iloc[-1]
-# table is sorted in descending order of a word's probability.
-# it has columns 'word' (the word, a string),
-# 'frequency' (the cumulative probability, including that word)
-# 'lower' (the cumulative probabilitiy, not including that word)
+FREQS_FILE = 'word_freqs.csv'
+LEGAL_FILE = 'words_alpha.txt'
+MODEL_FILE = 'word_freqs.model'
+CODEBOOK_FILE = 'word_freqs.codebook'
+BIGRAM_FILE = 'word_freqs.bigram'
+
+def file_stamp(path):
+    # (size, modification time), or (-1, -1) if the file is missing.
+    try:
+        info = os.stat(path)
+    except OSError:
+        return -1, -1
+    return info.st_size, info.st_mtime_ns
+
+def freqs_stamp():
+    return file_stamp(FREQS_FILE)
+
+@contextlib.contextmanager
+def replace_file(path):
+    # Opens a new file next to path for writing, which is moved over path once
+    # it's complete. Writing over path in place would crash (with SIGBUS) any
+    # process that has it mapped, while this way they keep the old file.
+    import tempfile
+    f = tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or '.', delete=False)
+    try:
+        with f:
+            yield f
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(f.name, 0o666 & ~umask)
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+class StringArray:
+    # A read-only list of strings stored as one '\n'-joined blob plus the
+    # offset of each string, so it can live in a memory-mapped file.
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return str(self.raw(i), 'utf-8')
+
+    def __iter__(self):
+        return iter(str(self.blob[:-1], 'utf-8').split('\n'))
+
+    def raw(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i+1]-1]
+
+class HashIndex:
+    # Maps a string to its position in a StringArray with an open addressing
+    # hash table, slots[crc32(word) % len(slots)] holding position+1 (0 is an
+    # empty slot). It's built by compile_model and mapped along with the rest
+    # of the model, so nothing has to be hashed at load time.
+    def __init__(self, strings, slots):
+        self.strings = strings
+        self.slots = slots
+
+    @staticmethod
+    def build(words):
+        # The first occurrence of a repeated word wins, like legal_index.
+        size = 1
+        while size < 2*len(words):
+            size *= 2
+        slots = array.array('I', [0]) * size
+        for i, word in enumerate(words):
+            key = word.encode('utf-8')
+            slot = zlib.crc32(key) & (size-1)
+            while slots[slot] and words[slots[slot]-1] != word:
+                slot = (slot + 1) & (size-1)
+            if not slots[slot]:
+                slots[slot] = i + 1
+        return slots
+
+    def get(self, word, default=None):
+        key = word.encode('utf-8')
+        mask = len(self.slots) - 1
+        slot = zlib.crc32(key) & mask
+        while self.slots[slot]:
+            i = self.slots[slot] - 1
+            if self.strings.raw(i) == key:
+                return i
+            slot = (slot + 1) & mask
+        return default
+
+    def __getitem__(self, word):
+        i = self.get(word)
+        if i is None:
+            raise KeyError(word)
+        return i
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+class Model:
+    # words is sorted in descending order of a word's probability.
+    # lower[i] is the cumulative probability not including words[i] and
+    # upper[i] is the cumulative probability including it.
+    # legal_words is the list of words from words_alpha.txt that the encoded
+    # sentences are made of.
+    # path is the compiled model file it was loaded from, if any, and stamp
+    # is the file_stamp of the word_freqs.csv it was made from.
+    def __init__(self, words, lower, upper, legal_words, path=None, stamp=(-1, -1)):
+        self.words = words
+        self.lower = lower
+        self.upper = upper
+        self.legal_words = legal_words
+        self.path = path
+        self.stamp = stamp
+
+    # Hash indexes so that looking a word up doesn't scan the whole list.
+    # word_index maps a word to its position in words, legal_index maps a word
+    # to its position in legal_words (the first one, if a word is listed
+    # twice). A compiled model comes with HashIndexes, otherwise they're dicts
+    # built the first time they're needed.
+    @functools.cached_property
+    def word_index(self):
+        return dict(zip(self.words, range(len(self.words))))
+
+    @functools.cached_property
+    def legal_index(self):
+        words = list(self.legal_words)
+        return dict(zip(reversed(words), range(len(words)-1, -1, -1)))
+
+    # The model as pandas DataFrames, for interactive use.
+    # table has columns 'word' (the word, a string),
+    # 'frequency' (the cumulative probability, including that word)
+    # 'lower' (the cumulative probabilitiy, not including that word)
+    @functools.cached_property
+    def table(self):
+        import pandas as pd
+        return pd.DataFrame({'word': list(self.words),
+                             'frequency': list(self.upper),
+                             'lower': list(self.lower)})
+
+    @functools.cached_property
+    def legal(self):
+        import pandas as pd
+        return pd.DataFrame({'word': list(self.legal_words)})
+
+    @functools.cached_property
+    def decode_table(self):
+        return build_decode_table(self.lower)
+
+    # counts[n] is the number of words with n bit Huffman codes. It's stored
+    # in a compiled model.
+    @functools.cached_property
+    def huffman_counts(self):
+        return huffman_counts([upper - lower for lower, upper in zip(self.lower, self.upper)])
+
+    @functools.cached_property
+    def huffman(self):
+        return huffman_tables(self.huffman_counts)
+
+    # The cumulative probabilities as integers out of RANGE_TOTAL for the
+    # range codec. Every word gets at least 1, so cumulative[i+1] is always
+    # greater than cumulative[i], and cumulative[-1] is RANGE_TOTAL.
+    @functools.cached_property
+    def cumulative(self):
+        scale = RANGE_TOTAL - len(self.words)
+        out = array.array('Q', (int(lower*scale) + i for i, lower in enumerate(self.lower)))
+        out.append(RANGE_TOTAL)
+        return out
+
+def build_model():
+    import pandas as pd
+    # word_freqs.csv taken from https://github.com/harshnative/words-dataset
+    # keep_default_na=False stops words like 'null' and 'nan' becoming NaN.
+    table = pd.read_csv(FREQS_FILE, keep_default_na=False).drop('index', axis=1)
+    legal = pd.read_csv(LEGAL_FILE, names=['word'], keep_default_na=False) # https://websites.umich.edu/~jlawler/wordlist.html
+    legal['word'] = legal['word'].str.lower()
+    # We use ; as an EOF symbol with frequency assumed to be 1/25
+    table.loc[len(table)] = ';', table['frequency'].sum()//24
+    table = table.sort_values('frequency', ascending=False, ignore_index=True).loc[:SIMPLE_WORDS-2]
+    temp = table['frequency']
+    table['frequency'] = table['frequency'].cumsum()
+    table['lower'] = table['frequency'] - temp
+    table['lower'] /= table['frequency'].iloc[-1]
+    table['frequency'] /= table['frequency'].iloc[-1]
+    return Model(list(table['word']), array.array('d', table['lower']),
+                 array.array('d', table['frequency']), list(legal['word']),
+                 stamp=freqs_stamp())
+
+# word_freqs.model is a header, the lower and upper arrays as doubles, the
+# offsets of the words and the legal words, their HashIndex slots, the
+# Huffman code counts, then the blobs of the two StringArrays.
+# The header records NUM_BITS and the size and modification time of
+# word_freqs.csv and words_alpha.txt, so the model is rebuilt from them if
+# they're edited. The arrays are in native byte order.
+MODEL_HEADER = struct.Struct('<8sIqqqqIIIIIQQ')
+MODEL_MAGIC = b'VLCMODL3'
+
+def align(n):
+    return n + (-n % 8)
+
+def compile_model(model=None, path=MODEL_FILE):
+    if model is None:
+        model = build_model()
+    blobs = []
+    offsets = []
+    slots = []
+    for words in (list(model.words), list(model.legal_words)):
+        blob = ''.join(word + '\n' for word in words).encode('utf-8')
+        offset = array.array('I', [0])
+        for word in words:
+            offset.append(offset[-1] + len(word.encode('utf-8')) + 1)
+        blobs.append(blob)
+        offsets.append(offset)
+        slots.append(HashIndex.build(words))
+    with replace_file(path) as f:
+        f.write(MODEL_HEADER.pack(MODEL_MAGIC, NUM_BITS,
+                                  *model.stamp, *file_stamp(LEGAL_FILE),
+                                  len(model.words), len(model.legal_words),
+                                  len(slots[0]), len(slots[1]),
+                                  len(model.huffman_counts),
+                                  len(blobs[0]), len(blobs[1])))
+        f.write(b'\0' * (align(MODEL_HEADER.size) - MODEL_HEADER.size))
+        for part in (array.array('d', model.lower), array.array('d', model.upper),
+                     offsets[0], offsets[1], slots[0], slots[1],
+                     array.array('I', model.huffman_counts)):
+            data = part.tobytes()
+            f.write(data + b'\0' * (align(len(data)) - len(data)))
+        f.write(blobs[0])
+        f.write(blobs[1])
+
+def load_model(path=MODEL_FILE):
+    # Maps a compiled model into memory, so processes that load the same file
+    # share its pages. Returns None if there's no up to date model at path.
+    try:
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mm) < MODEL_HEADER.size:
+        return None
+    (magic, num_bits, freqs_size, freqs_mtime, legal_size, legal_mtime,
+     num_words, num_legal, num_word_slots, num_legal_slots, num_counts,
+     words_len, legal_len) = MODEL_HEADER.unpack_from(mm)
+    if (magic, num_bits) != (MODEL_MAGIC, NUM_BITS):
+        return None
+    # If the text files aren't around, trust the compiled model.
+    for source, stamp in ((FREQS_FILE, (freqs_size, freqs_mtime)),
+                          (LEGAL_FILE, (legal_size, legal_mtime))):
+        if os.path.exists(source) and file_stamp(source) != stamp:
+            return None
+    view = memoryview(mm)
+    start = align(MODEL_HEADER.size)
+    parts = []
+    for fmt, count in (('d', num_words), ('d', num_words),
+                       ('I', num_words+1), ('I', num_legal+1),
+                       ('I', num_word_slots), ('I', num_legal_slots),
+                       ('I', num_counts)):
+        size = count * struct.calcsize(fmt)
+        parts.append(view[start:start+size].cast(fmt))
+        start += align(size)
+    (lower, upper, word_offsets, legal_offsets, word_slots, legal_slots,
+     counts) = parts
+    words = StringArray(view[start:start+words_len], word_offsets)
+    start += words_len
+    legal_words = StringArray(view[start:start+legal_len], legal_offsets)
+    model = Model(words, lower, upper, legal_words, path, (freqs_size, freqs_mtime))
+    model.word_index = HashIndex(words, word_slots)
+    model.legal_index = HashIndex(legal_words, legal_slots)
+    if num_counts == HUFFMAN_MAX_BITS + 1:
+        model.huffman_counts = counts
+    return model
+
+model = load_model()
+if model is None:
+    model = build_model()
+
+def __getattr__(name):
+    # table, legal, word_index and legal_index used to be module variables.
+    if name in ('table', 'legal', 'word_index', 'legal_index'):
+        return getattr(model, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def lookup(index, word, source):
+    try:
+        return index[word]
+    except KeyError:
+        raise KeyError(f'"{word}" is not in {source}') from None
 
 def get_index(word):
-    l = table[table['word'] == word].index
-    if len(l) == 1:
-        return l[0]
-    return None
+    return model.word_index.get(word)
 
 def get_lower(word):
     if type(word) == type(''):
-        word = get_index(word)
-    return table['lower'].iloc[word]
+        word = lookup(model.word_index, word, FREQS_FILE)
+    return model.lower[word]
 
 def get_upper(word):
     if type(word) == type(''):
-        word = get_index(word)
-    return table['frequency'].iloc[word]
+        word = lookup(model.word_index, word, FREQS_FILE)
+    return model.upper[word]
 
-def decode_bits(bits):
-    lower = 0.0
-    upper = 1.0
-    run = 0
-    lower_index = 0
-    upper_index = len(table)-1
-    out = []
-    for bit in bits:
-        if bit == ' ':
-            continue
-        bit = bool(int(bit))
-        run += 1
-        if bit:
-            lower += 2 ** -run
+class BitWriter:
+    # Packs bits, most significant first, into chunks of width bits, so
+    # width=8 gives bytes and width=NUM_BITS gives indexes into legal_words.
+    # Whole chunks are appended to chunks as soon as they're complete, or
+    # passed to sink instead if it's given.
+    def __init__(self, width=8, sink=None):
+        self.width = width
+        self.chunks = array.array('B' if width <= 8 else 'L')
+        self.sink = self.chunks.append if sink is None else sink
+        self.acc = 0
+        self.acc_bits = 0
+        self.bits = 0
+
+    def write(self, value, nbits):
+        # value has to fit in nbits bits.
+        acc = (self.acc << nbits) | value
+        acc_bits = self.acc_bits + nbits
+        while acc_bits >= self.width:
+            acc_bits -= self.width
+            self.sink(acc >> acc_bits)
+            acc &= (1 << acc_bits) - 1
+        self.acc = acc
+        self.acc_bits = acc_bits
+        self.bits += nbits
+
+    def flush(self):
+        # Pads the last chunk with zeros.
+        if self.acc_bits:
+            self.write(0, self.width - self.acc_bits)
+
+class BitReader:
+    # Reads bits, most significant first, from an iterable of width bit
+    # chunks, only pulling chunks from it as they're needed. If nbits is
+    # given, only that many bits are real and the rest of the last chunk is
+    # padding. Past the end it reads zeros, and has() says whether bits are
+    # real. pos is the number of bits read so far, end is the number of real
+    # bits once it's known.
+    def __init__(self, chunks, width=8, nbits=None):
+        self.chunks = iter(chunks)
+        self.width = width
+        self.acc = 0
+        self.acc_bits = 0
+        self.loaded = 0
+        self.pos = 0
+        self.end = nbits
+
+    def fill(self, n):
+        while self.acc_bits < n:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                if self.end is None:
+                    self.end = self.loaded
+                self.acc <<= n - self.acc_bits
+                self.acc_bits = n
+                return
+            self.acc = (self.acc << self.width) | chunk
+            self.acc_bits += self.width
+            self.loaded += self.width
+
+    def has(self, n):
+        if self.end is None:
+            self.fill(n)
+        return self.end is None or self.pos + n <= self.end
+
+    def peek(self, n):
+        self.fill(n)
+        return self.acc >> (self.acc_bits - n)
+
+    def skip(self, n):
+        self.fill(n)
+        self.acc_bits -= n
+        self.acc &= (1 << self.acc_bits) - 1
+        self.pos += n
+
+    def read(self, n):
+        value = self.peek(n)
+        self.skip(n)
+        return value
+
+def string_reader(bits):
+    # A BitReader for a string of '0's and '1's.
+    bits = bits.replace(' ', '')
+    padded = bits + '0'*(-len(bits) % 8)
+    data = int(padded, 2).to_bytes(len(padded)//8, 'big') if bits else b''
+    return BitReader(data, 8, len(bits))
+
+# Decoding reads the bits of a word's interval one at a time, narrowing
+# [lower, upper) until no word boundary is left inside it. Rather than doing
+# that for every bit, it looks DECODE_BITS bits up at once in a table that
+# was made by doing it for every possible DECODE_BITS bit prefix. Each entry
+# is either the word those bits start with and how many of the bits its code
+# uses, or (for words rarer than 2**-DECODE_BITS) the range of words that are
+# still possible, which goes on being narrowed one bit at a time.
+DECODE_BITS = 16
+
+def build_decode_table(lower, table_bits=DECODE_BITS):
+    # ranks[v] is the word that the bits of v start with, or -1 if there's
+    # more than one possibility, in which case the possible words are
+    # those from lower_indexes[v]-1 to upper_indexes[v]-1.
+    size = 2**table_bits
+    ranks = array.array('l', [-1]) * size
+    lengths = array.array('B', [0]) * size
+    lower_indexes = array.array('l', [0]) * size
+    upper_indexes = array.array('l', [0]) * size
+    # (prefix, number of bits in prefix, range of possible lower_indexes)
+    stack = [(1, 1, 0, len(lower)), (0, 1, 0, len(lower))]
+    while stack:
+        prefix, run, lo, hi = stack.pop()
+        lower_index = bisect.bisect_right(lower, math.ldexp(prefix, -run), lo, hi)
+        upper_index = bisect.bisect_left(lower, math.ldexp(prefix+1, -run), lower_index, hi)
+        if lower_index == upper_index:
+            start = prefix << (table_bits-run)
+            count = 2**(table_bits-run)
+            ranks[start:start+count] = array.array('l', [upper_index-1]) * count
+            lengths[start:start+count] = array.array('B', [run]) * count
+        elif run == table_bits:
+            lower_indexes[prefix] = lower_index
+            upper_indexes[prefix] = upper_index
         else:
-            upper -= 2 ** -run
-        upper_index = table['lower'].searchsorted(upper)
-        lower_index = table['lower'].searchsorted(lower, 'right')
-        if upper_index == lower_index:
-            out.append(table['word'].iloc[upper_index-1])
-            lower = 0.0
-            upper = 1.0
-            run = 0
-            lower_index = 0
-            upper_index = len(table)-1
-    return out
+            stack.append((2*prefix+1, run+1, lower_index, upper_index))
+            stack.append((2*prefix, run+1, lower_index, upper_index))
+    return ranks, lengths, lower_indexes, upper_indexes
+
+def interval_decode(reader):
+    # Yields words as soon as their codes have been read from reader.
+    lower = model.lower
+    words = model.words
+    ranks, lengths, lower_indexes, upper_indexes = model.decode_table
+    while reader.has(1):
+        window = reader.peek(DECODE_BITS)
+        rank = ranks[window]
+        if rank >= 0:
+            # Zeros past the end of the input can't complete a word.
+            if not reader.has(lengths[window]):
+                return
+            reader.skip(lengths[window])
+            yield words[rank]
+            continue
+        if not reader.has(DECODE_BITS):
+            return
+        reader.skip(DECODE_BITS)
+        prefix = window
+        run = DECODE_BITS
+        lower_index = lower_indexes[window]
+        upper_index = upper_indexes[window]
+        while lower_index != upper_index and reader.has(1):
+            prefix = 2*prefix + reader.read(1)
+            run += 1
+            lower_index = bisect.bisect_right(lower, math.ldexp(prefix, -run), lower_index, upper_index)
+            upper_index = bisect.bisect_left(lower, math.ldexp(prefix+1, -run), lower_index, upper_index)
+        if lower_index == upper_index:
+            yield words[upper_index-1]
+
+def decode_bits(bits):
+    return list(interval_decode(string_reader(bits)))
 
 def encode_word(word):
     word = word.lower()
@@ -86,6 +511,10 @@ def encode_word(word):
     except Exception as e:
         print(f'Could not encode "{word}": not in dictionary')
         return None
+    if codebook is not None:
+        lengths, codes = codebook
+        rank = model.word_index[word]
+        return format(codes[rank], 'b').zfill(lengths[rank]) if lengths[rank] else ''
     word_upper = get_upper(word)
     q = collections.deque()
     # (lower, upper, depth, string)
@@ -111,39 +540,738 @@ def encode_word(word):
             # elif upper > word_upper:
             #     q.appendleft(l_half)
 
+# The codebook caches encode_word's output for every word in the model as
+# (lengths, codes), where the code for word i is the lengths[i] lowest bits of
+# codes[i]. On disk it's a header, the lengths, then the codes as 64 bit
+# integers, which read_codebook maps like the model so that loading it at
+# import is cheap. The header records NUM_BITS, the number of words and the
+# size and modification time of the word_freqs.csv the model was made from,
+# so a codebook for a different model is stale.
+codebook = None
+CODEBOOK_HEADER = struct.Struct('<8sIqqI')
+CODEBOOK_MAGIC = b'VLCCODE2'
+
+def dyadic_code(word_lower, word_upper):
+    # The leftmost of the shortest intervals [k/2**d, (k+1)/2**d) that fit in
+    # [word_lower, word_upper), which is the interval encode_word's search
+    # finds. Multiplying by a power of 2 is exact, so this has no rounding.
+    depth = 0
+    while True:
+        k = math.ceil(math.ldexp(word_lower, depth))
+        if math.ldexp(k + 1, -depth) <= word_upper:
+            return k, depth
+        depth += 1
+
+def build_codebook():
+    lengths = array.array('B')
+    codes = array.array('Q')
+    for word_lower, word_upper in zip(model.lower, model.upper):
+        code, length = dyadic_code(word_lower, word_upper)
+        codes.append(code)
+        lengths.append(length)
+    return lengths, codes
+
+def save_codebook(book, path=CODEBOOK_FILE):
+    lengths, codes = book
+    with replace_file(path) as f:
+        f.write(CODEBOOK_HEADER.pack(CODEBOOK_MAGIC, NUM_BITS, *model.stamp, len(lengths)))
+        f.write(b'\0' * (align(CODEBOOK_HEADER.size) - CODEBOOK_HEADER.size))
+        for part in (array.array('B', lengths), array.array('Q', codes)):
+            data = part.tobytes()
+            f.write(data + b'\0' * (align(len(data)) - len(data)))
+
+def read_codebook(path=CODEBOOK_FILE):
+    # Returns None if the file is missing or was made for a different model.
+    try:
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mm) < CODEBOOK_HEADER.size:
+        return None
+    magic, num_bits, size, mtime, count = CODEBOOK_HEADER.unpack_from(mm)
+    if (magic, num_bits, count) != (CODEBOOK_MAGIC, NUM_BITS, len(model.words)):
+        return None
+    if (size, mtime) != model.stamp:
+        return None
+    start = align(CODEBOOK_HEADER.size)
+    if len(mm) < start + align(count) + 8*count:
+        return None
+    view = memoryview(mm)
+    lengths = view[start:start+count]
+    start += align(count)
+    codes = view[start:start+8*count].cast('Q')
+    return lengths, codes
+
+def load_codebook(path=CODEBOOK_FILE, build=True):
+    # Makes encode_word use the cached codebook at path. If it's missing or
+    # stale, it's rebuilt and saved when build is True, otherwise encode_word
+    # keeps searching for each code.
+    global codebook
+    book = read_codebook(path)
+    if book is None and build:
+        book = build_codebook()
+        save_codebook(book, path)
+    codebook = book
+    return book
+
+# Use the codebook if it's been made (with the codebook command).
+load_codebook(build=False)
+
+# The range codec arithmetic codes the whole sentence as one number with
+# integer arithmetic (the Witten, Neal & Cleary coder), using
+# model.cumulative. It doesn't restart at [0, 1) for every word like
+# encode_word does, so it doesn't waste up to a bit per word, and rare words
+# don't run into the precision of a float.
+# low and high are RANGE_BITS bit integers and the interval is
+# [low, high+1). Whenever low and high agree on their leading bits, those bits
+# are final and get shifted out. If the interval straddles the middle while
+# inside the middle half, it's expanded around the middle, and the bit that
+# will eventually settle it is owed (pending) along with its opposites.
+RANGE_BITS = 64
+RANGE_TOTAL = 2**32 # has to be at most 2**(RANGE_BITS-2)
+RANGE_MASK = 2**RANGE_BITS - 1
+RANGE_HALF = 2**(RANGE_BITS-1)
+RANGE_QUARTER = 2**(RANGE_BITS-2)
+
+class RangeEncoder:
+    # Codes a sequence of intervals [start, end) out of total into writer.
+    def __init__(self, writer):
+        self.writer = writer
+        self.low = 0
+        self.high = RANGE_MASK
+        self.pending = 0
+
+    def encode(self, start, end, total):
+        span = self.high - self.low + 1
+        high = self.low + span*end//total - 1
+        low = self.low + span*start//total
+        shift = RANGE_BITS - (low ^ high).bit_length()
+        if shift:
+            bits = low >> (RANGE_BITS-shift)
+            first = bits >> (shift-1)
+            self.writer.write(first, 1)
+            self.writer.write(0 if first else (1 << self.pending) - 1, self.pending)
+            self.writer.write(bits & ((1 << (shift-1)) - 1), shift-1)
+            self.pending = 0
+            low = (low << shift) & RANGE_MASK
+            high = ((high << shift) & RANGE_MASK) | ((1 << shift) - 1)
+        while low >= RANGE_QUARTER and high < RANGE_HALF + RANGE_QUARTER:
+            self.pending += 1
+            low = (low - RANGE_QUARTER) << 1
+            high = ((high - RANGE_QUARTER) << 1) | 1
+        self.low = low
+        self.high = high
+
+    def finish(self):
+        # Two more bits pick a quarter inside [low, high], and reading zeros
+        # after them stays inside it.
+        if self.low < RANGE_QUARTER:
+            self.writer.write(0, 1)
+            self.writer.write((1 << (self.pending+1)) - 1, self.pending+1)
+        else:
+            self.writer.write(1, 1)
+            self.writer.write(0, self.pending+1)
+
+class RangeDecoder:
+    # Reads back what a RangeEncoder wrote: target says where the next
+    # interval is, and consume moves past it once it's been worked out.
+    def __init__(self, reader):
+        self.reader = reader
+        self.value = reader.read(RANGE_BITS)
+        self.low = 0
+        self.high = RANGE_MASK
+
+    def more(self):
+        # False once everything left in value is padding. The encoder always
+        # finishes with at least two bits after the last interval's, so every
+        # real interval starts before the end of the input.
+        return self.reader.end is None or self.reader.pos - RANGE_BITS < self.reader.end
+
+    def target(self, total):
+        # The next interval is the one out of total that contains this.
+        span = self.high - self.low + 1
+        return ((self.value - self.low + 1)*total - 1)//span
+
+    def consume(self, start, end, total):
+        span = self.high - self.low + 1
+        high = self.low + span*end//total - 1
+        low = self.low + span*start//total
+        shift = RANGE_BITS - (low ^ high).bit_length()
+        if shift:
+            self.value = ((self.value << shift) & RANGE_MASK) | self.reader.read(shift)
+            low = (low << shift) & RANGE_MASK
+            high = ((high << shift) & RANGE_MASK) | ((1 << shift) - 1)
+        while low >= RANGE_QUARTER and high < RANGE_HALF + RANGE_QUARTER:
+            self.value = ((self.value - RANGE_QUARTER) << 1) | self.reader.read(1)
+            low = (low - RANGE_QUARTER) << 1
+            high = ((high - RANGE_QUARTER) << 1) | 1
+        self.low = low
+        self.high = high
+
+def range_encode(ranks, writer):
+    cumulative = model.cumulative
+    encoder = RangeEncoder(writer)
+    for rank in ranks:
+        encoder.encode(cumulative[rank], cumulative[rank+1], RANGE_TOTAL)
+    encoder.finish()
+
+def range_decode(reader):
+    # Yields words until ';', or until there's only padding left.
+    cumulative = model.cumulative
+    decoder = RangeDecoder(reader)
+    while decoder.more():
+        rank = bisect.bisect_right(cumulative, decoder.target(RANGE_TOTAL)) - 1
+        yield model.words[rank]
+        if model.words[rank] == ';':
+            return
+        decoder.consume(cumulative[rank], cumulative[rank+1], RANGE_TOTAL)
+
+# The huffman codec gives each word a canonical Huffman code of at most
+# HUFFMAN_MAX_BITS bits. The words are sorted by probability, so the codes are
+# handed out in that order: the shortest codes go to the first words, and the
+# codes of one length are consecutive numbers for consecutive words. That
+# makes the whole code just the number of codes of each length.
+
+def huffman_counts(weights, max_bits=HUFFMAN_MAX_BITS):
+    # counts[n] is the number of n bit codes in a Huffman code for weights,
+    # limited to max_bits bits.
+    n = len(weights)
+    counts = [0] * (max_bits+1)
+    if n == 1:
+        counts[1] = 1
+        return counts
+    # Nodes 0 to n-1 are the leaves in ascending order of weight, and the
+    # merged nodes come after them, also in ascending order of weight. So the
+    # two lightest nodes are always at the front of one of the two queues.
+    weight = sorted(weights) + [0.0]*(n-1)
+    parent = [0] * (2*n-1)
+    leaf = 0
+    merged = n
+    for node in range(n, 2*n-1):
+        for _ in range(2):
+            if leaf < n and (merged == node or weight[leaf] <= weight[merged]):
+                child = leaf
+                leaf += 1
+            else:
+                child = merged
+                merged += 1
+            weight[node] += weight[child]
+            parent[child] = node
+    depth = [0] * (2*n-1)
+    for node in range(2*n-3, -1, -1):
+        depth[node] = depth[parent[node]] + 1
+        if node < n:
+            counts[min(depth[node], max_bits)] += 1
+    # Clamping the lengths to max_bits overfills the code, so move codes
+    # from the longest length below max_bits down a level until it fits,
+    # then move codes back up a level wherever that leaves room.
+    space = 2**max_bits
+    used = sum(count << (max_bits-length) for length, count in enumerate(counts))
+    while used > space:
+        length = max_bits - 1
+        while not counts[length]:
+            length -= 1
+        counts[length] -= 1
+        counts[length+1] += 1
+        used -= 2**(max_bits-length-1)
+    for length in range(max_bits, 1, -1):
+        while counts[length] and used + 2**(max_bits-length) <= space:
+            counts[length] -= 1
+            counts[length-1] += 1
+            used += 2**(max_bits-length)
+    return counts
+
+def huffman_tables(counts):
+    # For each length n: the first code of that length, the rank of its
+    # word, and (for decoding) the first max_bits bit number that's past all
+    # the codes of length n or less.
+    max_bits = len(counts) - 1
+    first_codes = [0] * (max_bits+1)
+    first_ranks = [0] * (max_bits+1)
+    limits = [0] * (max_bits+1)
+    code = 0
+    rank = 0
+    for length in range(1, max_bits+1):
+        first_codes[length] = code
+        first_ranks[length] = rank
+        code += counts[length]
+        rank += counts[length]
+        limits[length] = code << (max_bits-length)
+        code <<= 1
+    return first_codes, first_ranks, limits
+
+def huffman_encode(ranks, writer):
+    counts = model.huffman_counts
+    first_codes, first_ranks, limits = model.huffman
+    for rank in ranks:
+        length = bisect.bisect_right(first_ranks, rank, 1) - 1
+        while not counts[length]:
+            length -= 1
+        writer.write(first_codes[length] + rank - first_ranks[length], length)
+
+def huffman_decode(reader):
+    first_codes, first_ranks, limits = model.huffman
+    max_bits = len(limits) - 1
+    while reader.has(1):
+        window = reader.peek(max_bits)
+        length = bisect.bisect_right(limits, window, 1)
+        if length > max_bits or not reader.has(length):
+            return
+        reader.skip(length)
+        yield model.words[first_ranks[length] + (window >> (max_bits-length)) - first_codes[length]]
+
+# The bigram codec is the range codec, except that each word's interval
+# depends on the word before it (';' before the first word). For each word,
+# a Bigram holds the words that followed it in a training corpus with their
+# counts, plus an escape count for everything else. A word that isn't
+# listed is coded as the escape and then with the range codec's intervals.
+# Train one with 'python variable_length_code.py bigram corpus.txt'.
+# On disk it's a header then the Bigram's arrays, which load_bigram maps.
+# Like the codebook, it's stale once word_freqs.csv or NUM_BITS changes.
+bigram = None
+BIGRAM_HEADER = struct.Struct('<8sIqqII')
+BIGRAM_MAGIC = b'VLCBGRM1'
+
+class Bigram:
+    # The words that followed model.words[c] are
+    # successors[starts[c]:starts[c+1]], sorted by rank, and ends[i] is the
+    # count of successors[i] plus the counts of the ones before it for the
+    # same c. escapes[c] is the count for all other words.
+    def __init__(self, starts, successors, ends, escapes):
+        self.starts = starts
+        self.successors = successors
+        self.ends = ends
+        self.escapes = escapes
+
+def train_bigram(lines, min_count=2, max_successors=255):
+    # Each line of lines is a sentence, and anything that isn't a word in the
+    # model starts a new one. Only the max_successors most common words after
+    # each word are kept, if they were seen at least min_count times. The
+    # escape count is the number of different words seen after it plus the
+    # counts of the ones that weren't kept.
+    n = len(model.words)
+    end = model.word_index[';']
+    pairs = collections.Counter()
+    for line in lines:
+        prev = end
+        for word in line.lower().split():
+            rank = model.word_index.get(word)
+            if rank is None:
+                prev = end
+                continue
+            pairs[prev*n + rank] += 1
+            prev = rank
+        pairs[prev*n + end] += 1
+    followers = collections.defaultdict(list)
+    for key, count in pairs.items():
+        followers[key // n].append((key % n, count))
+    starts = array.array('I', [0])
+    successors = array.array('I')
+    ends = array.array('Q')
+    escapes = array.array('Q', [0]) * n
+    for context in range(n):
+        seen = followers.get(context, [])
+        kept = sorted((f for f in seen if f[1] >= min_count), key=lambda f: -f[1])[:max_successors]
+        escapes[context] = len(seen) + sum(count for rank, count in seen) - sum(count for rank, count in kept)
+        total = 0
+        for rank, count in sorted(kept):
+            total += count
+            successors.append(rank)
+            ends.append(total)
+        starts.append(len(successors))
+    return Bigram(starts, successors, ends, escapes)
+
+def save_bigram(bigram, path=BIGRAM_FILE):
+    with replace_file(path) as f:
+        f.write(BIGRAM_HEADER.pack(BIGRAM_MAGIC, NUM_BITS, *freqs_stamp(),
+                                   len(bigram.escapes), len(bigram.successors)))
+        f.write(b'\0' * (align(BIGRAM_HEADER.size) - BIGRAM_HEADER.size))
+        for part in (bigram.ends, bigram.escapes, bigram.starts, bigram.successors):
+            data = part.tobytes()
+            f.write(data + b'\0' * (align(len(data)) - len(data)))
+
+def load_bigram(path=BIGRAM_FILE):
+    # Returns None if there's no up to date Bigram at path.
+    try:
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mm) < BIGRAM_HEADER.size:
+        return None
+    magic, num_bits, size, mtime, num_words, num_entries = BIGRAM_HEADER.unpack_from(mm)
+    if (magic, num_bits, num_words) != (BIGRAM_MAGIC, NUM_BITS, len(model.words)):
+        return None
+    if os.path.exists(FREQS_FILE) and (size, mtime) != freqs_stamp():
+        return None
+    view = memoryview(mm)
+    start = align(BIGRAM_HEADER.size)
+    parts = []
+    for fmt, count in (('Q', num_entries), ('Q', num_words),
+                       ('I', num_words+1), ('I', num_entries)):
+        size = count * struct.calcsize(fmt)
+        parts.append(view[start:start+size].cast(fmt))
+        start += align(size)
+    ends, escapes, starts, successors = parts
+    return Bigram(starts, successors, ends, escapes)
+
+def get_bigram():
+    global bigram
+    if bigram is None:
+        bigram = load_bigram()
+        if bigram is None:
+            raise ValueError(f'the bigram codec needs {BIGRAM_FILE}, see train_bigram')
+    return bigram
+
+def bigram_encode(ranks, writer):
+    cumulative = model.cumulative
+    contexts = get_bigram()
+    starts, successors, ends, escapes = contexts.starts, contexts.successors, contexts.ends, contexts.escapes
+    encoder = RangeEncoder(writer)
+    context = model.word_index[';']
+    for rank in ranks:
+        lo = starts[context]
+        hi = starts[context+1]
+        if lo < hi:
+            total = ends[hi-1] + escapes[context]
+            i = bisect.bisect_left(successors, rank, lo, hi)
+            if i < hi and successors[i] == rank:
+                encoder.encode(ends[i-1] if i > lo else 0, ends[i], total)
+                context = rank
+                continue
+            encoder.encode(ends[hi-1], total, total)
+        encoder.encode(cumulative[rank], cumulative[rank+1], RANGE_TOTAL)
+        context = rank
+    encoder.finish()
+
+def bigram_decode(reader):
+    cumulative = model.cumulative
+    contexts = get_bigram()
+    starts, successors, ends, escapes = contexts.starts, contexts.successors, contexts.ends, contexts.escapes
+    decoder = RangeDecoder(reader)
+    context = model.word_index[';']
+    while decoder.more():
+        lo = starts[context]
+        hi = starts[context+1]
+        rank = None
+        if lo < hi:
+            total = ends[hi-1] + escapes[context]
+            target = decoder.target(total)
+            if target < ends[hi-1]:
+                i = bisect.bisect_right(ends, target, lo, hi)
+                rank = successors[i]
+                decoder.consume(ends[i-1] if i > lo else 0, ends[i], total)
+            else:
+                decoder.consume(ends[hi-1], total, total)
+        if rank is None:
+            rank = bisect.bisect_right(cumulative, decoder.target(RANGE_TOTAL)) - 1
+            decoder.consume(cumulative[rank], cumulative[rank+1], RANGE_TOTAL)
+        yield model.words[rank]
+        if model.words[rank] == ';':
+            return
+        context = rank
 
-def encode(sentence):
-    sentence = sentence.split()
-    sentence.append(';')
-    binary = ''
-    for word in sentence:
-        x = encode_word(word)
-        binary += encode_word(word)
-    binary = binary + '0'*(NUM_BITS-len(binary) % NUM_BITS)
-    out = []
-    for i in range(len(binary)//NUM_BITS):
-        eighteen_bits = binary[NUM_BITS*i:NUM_BITS*(i+1)]
-        out.append(legal['word'].iloc[int(eighteen_bits, 2)])
-    return ' '.join(out)
-
-def decode(sentence):
-    sentence = sentence.split()
-    binary = ''
-    for word in sentence:
-        word_index = (legal[legal['word'] == word].index)[0]
-        word_binary = bin(word_index)[2:]
-        binary += word_binary.rjust(NUM_BITS, '0')
-    temp = decode_bits(binary)
-    if ';' in temp:
-        return ' '.join(temp[:temp.index(';')])
-    return ' '.join(decode_bits(binary))
+def word_code(rank):
+    # encode_word's code for model.words[rank] as (code, length).
+    if codebook is not None:
+        lengths, codes = codebook
+        return codes[rank], lengths[rank]
+    return dyadic_code(model.lower[rank], model.upper[rank])
+
+def word_ranks(words):
+    # The position of each word in model.words, then the position of ';'.
+    for word in words:
+        yield lookup(model.word_index, word.lower(), FREQS_FILE)
+    yield model.word_index[';']
+
+def interval_encode(ranks, writer):
+    for rank in ranks:
+        writer.write(*word_code(rank))
+
+ENCODERS = {'interval': interval_encode, 'range': range_encode,
+            'huffman': huffman_encode, 'bigram': bigram_encode}
+DECODERS = {'interval': interval_decode, 'range': range_decode,
+            'huffman': huffman_decode, 'bigram': bigram_decode}
+CODECS = tuple(ENCODERS)
+
+def encode_bits(words, codec, writer):
+    # codec is 'interval' for a prefix code per word (see encode_word),
+    # 'range' for the range codec, 'huffman' for the Huffman codec, or
+    # 'bigram' for the range codec with the previous word as context.
+    if codec not in ENCODERS:
+        raise ValueError(f'codec must be one of {CODECS}')
+    ENCODERS[codec](word_ranks(words), writer)
+
+def pad_words(writer, codec):
+    # Pads the encoded bits to a whole number of NUM_BITS bit words.
+    if codec == 'interval' and writer.bits % NUM_BITS == 0:
+        # The interval codec has always padded with at least one bit.
+        writer.write(0, NUM_BITS)
+    writer.flush()
+
+def decode_words(reader, codec):
+    # Yields the decoded words up to the ';' at the end.
+    if codec not in DECODERS:
+        raise ValueError(f'codec must be one of {CODECS}')
+    for word in DECODERS[codec](reader):
+        if word == ';':
+            return
+        yield word
+
+def encode_bytes(sentence, codec='interval'):
+    # Like encode, but returns the encoded bits packed into bytes.
+    writer = BitWriter(8)
+    encode_bits(sentence.split(), codec, writer)
+    writer.flush()
+    return writer.chunks.tobytes()
+
+def decode_bytes(data, codec='interval'):
+    return ' '.join(decode_words(BitReader(data, 8), codec))
+
+def encode(sentence, codec='interval'):
+    # decode needs to be told the same codec.
+    writer = BitWriter(NUM_BITS)
+    encode_bits(sentence.split(), codec, writer)
+    pad_words(writer, codec)
+    return ' '.join(model.legal_words[i] for i in writer.chunks)
+
+def decode(sentence, codec='interval'):
+    legal_rows = (lookup(model.legal_index, word, LEGAL_FILE) for word in sentence.split())
+    return ' '.join(decode_words(BitReader(legal_rows, NUM_BITS), codec))
+
+# profile_stages times the three stages of encoding and decoding: looking words
+# up in the model, the codec's own interval search, and packing bits. It does
+# it by swapping timed wrappers in for the functions while it's in use, so
+# there's no cost the rest of the time. A stage's time doesn't include time
+# spent in the other stages, so the stages add up to less than the total.
+STAGES = ('lookup', 'interval_search', 'bit_packing')
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.nested = [] # time spent in stages called by each running stage
+
+    def wrap(self, stage, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            self.nested.append(0.0)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.seconds[stage] += elapsed - self.nested.pop()
+                self.calls[stage] += 1
+                if self.nested:
+                    self.nested[-1] += elapsed
+        return timed
+
+    def wrap_generator(self, stage, func):
+        # The decoders do their work as they're iterated over.
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            step = self.wrap(stage, next)
+            words = func(*args, **kwargs)
+            while True:
+                try:
+                    word = step(words)
+                except StopIteration:
+                    return
+                yield word
+        return timed
+
+@contextlib.contextmanager
+def profile_stages():
+    # with profile_stages() as timer:
+    #     encode(sentence)
+    # print(timer.seconds)
+    timer = StageTimer()
+    module = sys.modules[__name__]
+    patches = [(vars(module), 'lookup', timer.wrap('lookup', lookup))]
+    for name in ('write', 'flush'):
+        patches.append((BitWriter, name, timer.wrap('bit_packing', vars(BitWriter)[name])))
+    for name in ('fill', 'has', 'peek', 'skip', 'read'):
+        patches.append((BitReader, name, timer.wrap('bit_packing', vars(BitReader)[name])))
+    for codec in CODECS:
+        patches.append((ENCODERS, codec, timer.wrap('interval_search', ENCODERS[codec])))
+        patches.append((DECODERS, codec, timer.wrap_generator('interval_search', DECODERS[codec])))
+    originals = []
+    for target, name, wrapper in patches:
+        if isinstance(target, dict):
+            originals.append((target, name, target[name]))
+            target[name] = wrapper
+        else:
+            originals.append((target, name, vars(target)[name]))
+            setattr(target, name, wrapper)
+    try:
+        yield timer
+    finally:
+        for target, name, original in originals:
+            if isinstance(target, dict):
+                target[name] = original
+            else:
+                setattr(target, name, original)
+
+def init_worker(book):
+    global codebook
+    codebook = book
+
+def map_many(func, items, processes, chunksize):
+    # The workers get the model by importing this module: forked workers
+    # share the parent's copy, others map word_freqs.model, or build the model
+    # with pandas if it hasn't been compiled (see the compile command).
+    if processes == 1:
+        return [func(item) for item in items]
+    import multiprocessing
+    book = codebook
+    if book is not None:
+        # A mapped codebook can't be pickled.
+        book = array.array('B', book[0]), array.array('Q', book[1])
+    with multiprocessing.Pool(processes, init_worker, (book,)) as pool:
+        return list(pool.imap(func, items, chunksize))
+
+def encode_many(sentences, codec='interval', processes=None, chunksize=64):
+    # Encodes each sentence in sentences on a pool of processes (one per
+    # core if processes is None), returning the results in order. chunksize
+    # sentences are sent to a worker at a time.
+    return map_many(functools.partial(encode, codec=codec), sentences, processes, chunksize)
+
+def decode_many(sentences, codec='interval', processes=None, chunksize=64):
+    return map_many(functools.partial(decode, codec=codec), sentences, processes, chunksize)
+
+def read_words(f, size=2**16):
+    # Yields the whitespace separated words in f, reading size characters at
+    # a time.
+    rest = ''
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            break
+        words = (rest + chunk).split()
+        rest = '' if chunk[-1].isspace() else words.pop()
+        yield from words
+    if rest:
+        yield rest
+
+class WordWriter:
+    # Writes words to a file, separated by spaces, as they're given to it.
+    def __init__(self, f):
+        self.f = f
+        self.sep = ''
+
+    def __call__(self, word):
+        self.f.write(self.sep + word)
+        self.sep = ' '
+
+def encode_stream(infile, outfile, codec='interval'):
+    # Like encode, but for the words in infile, writing each encoded word to
+    # outfile as soon as its NUM_BITS bits are known, so the memory used
+    # doesn't depend on the length of the input.
+    out = WordWriter(outfile)
+    writer = BitWriter(NUM_BITS, lambda i: out(model.legal_words[i]))
+    encode_bits(read_words(infile), codec, writer)
+    pad_words(writer, codec)
+    outfile.write('\n')
+
+def decode_stream(infile, outfile, codec='interval'):
+    # Like decode, but for the words in infile, writing each decoded word to
+    # outfile as soon as it's known.
+    out = WordWriter(outfile)
+    legal_rows = (lookup(model.legal_index, word, LEGAL_FILE) for word in read_words(infile))
+    for word in decode_words(BitReader(legal_rows, NUM_BITS), codec):
+        out(word)
+    outfile.write('\n')
+
+def handle_request(line):
+    # Handles one request for serve, which is a line like the arguments to
+    # this script: 'encode [--codec=range] some words' or 'decode ...'. The
+    # response is a line of JSON with either the 'result' or an 'error', and
+    # the 'seconds' it took.
+    start = time.perf_counter()
+    args = line.split()
+    codec = 'interval'
+    if len(args) > 1 and args[1].startswith('--codec='):
+        codec = args.pop(1)[len('--codec='):]
+    try:
+        if not args or args[0].lower() not in ('encode', 'decode'):
+            raise ValueError('invalid instruction')
+        code = encode if args[0].lower() == 'encode' else decode
+        response = {'result': code(' '.join(args[1:]), codec)}
+    except (KeyError, ValueError) as e:
+        response = {'error': str(e.args[0])}
+    response['seconds'] = time.perf_counter() - start
+    return json.dumps(response)
+
+async def serve_client(reader, writer):
+    async for line in reader:
+        writer.write(handle_request(line.decode(errors='replace')).encode() + b'\n')
+        await writer.drain()
+    writer.close()
+
+async def serve(path=None):
+    # Answers newline separated requests (see handle_request) on the Unix
+    # socket at path, or on stdin and stdout if path is None, so that the
+    # model is only loaded once. Each connection is served concurrently.
+    # Bytes that aren't UTF-8 come through as U+FFFD, which no word has, so
+    # they get an error response.
+    import asyncio
+    for codec in CODECS:
+        # Build all the lookup tables before the first request.
+        try:
+            decode(encode('', codec), codec)
+        except ValueError:
+            pass # the bigram codec, without a trained Bigram
+    if path is None:
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=2**24)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        async for line in reader:
+            sys.stdout.write(handle_request(line.decode(errors='replace')) + '\n')
+            sys.stdout.flush()
+        return
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        import socket
+        with socket.socket(socket.AF_UNIX) as probe:
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                # Left over from a server that's gone.
+                os.unlink(path)
+            else:
+                raise OSError(errno.EADDRINUSE, 'a server is already listening on', path)
+    server = await asyncio.start_unix_server(serve_client, path, limit=2**24)
+    async with server:
+        await server.serve_forever()
 
 if __name__ == '__main__':
     instruction = sys.argv[1]
-    sentence = ' '.join(sys.argv[2:])
+    args = sys.argv[2:]
+    codec = 'interval'
+    if args and args[0].startswith('--codec='):
+        codec = args.pop(0)[len('--codec='):]
+    sentence = ' '.join(args)
     if instruction.lower() == 'encode':
-        print(encode(sentence))
+        print(encode(sentence, codec))
+    elif instruction.lower() in ('encode-stream', 'decode-stream'):
+        stream = encode_stream if instruction.lower() == 'encode-stream' else decode_stream
+        if args and args[0] != '-':
+            with open(args[0]) as f:
+                stream(f, sys.stdout, codec)
+        else:
+            stream(sys.stdin, sys.stdout, codec)
+    elif instruction.lower() == 'serve':
+        import asyncio
+        asyncio.run(serve(args[0] if args else None))
+    elif instruction.lower() == 'bigram':
+        with open(args[0]) as f:
+            save_bigram(train_bigram(f), args[1] if len(args) > 1 else BIGRAM_FILE)
+    elif instruction.lower() == 'codebook':
+        load_codebook()
+    elif instruction.lower() == 'compile':
+        compile_model(build_model())
     elif instruction.lower() == 'decode':
-        print(decode(sentence))
+        print(decode(sentence, codec))
     else:
         print('invalid instruction')
\ No newline at end of file
@@ -0,0 +1,232 @@
+# Benchmarks variable_length_code.py, so that changes to the model or the codecs
+# can be checked for regressions. It reports:
+# how long the model takes to import and load,
+# encode_word and decode_bits throughput in words per second,
+# each codec's encode and decode throughput and the average number of bits it
+# outputs per input word (counting the ';' that ends each sentence),
+# and peak memory.
+# It fails if word_freqs.codebook is up to date but encode isn't using it, or
+# if its codes differ from the ones encode_word searches for.
+# To run it on a reference corpus with one sentence per line (words that aren't
+# in the model are skipped):
+# python variable_length_code_bench.py corpus.txt
+# Without a corpus, it uses sentences sampled from the model with a fixed seed.
+# --stages also times the lookup, interval search and bit packing stages of
+# each codec (see profile_stages in variable_length_code.py), and
+# --output=results.json writes the results there as JSON. --repeat=N takes the
+# best of N runs of each timing (3 by default).
+import json
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+start = time.perf_counter()
+import variable_length_code as vlc
+IMPORT_SECONDS = time.perf_counter() - start
+
+def best_time(func, repeat):
+    # The fastest of repeat calls to func, in seconds.
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def sample_corpus(num_sentences=1000, sentence_words=10, seed=0):
+    # Sentences of words drawn from the model's own probabilities.
+    rng = random.Random(seed)
+    words = vlc.model.words
+    end = vlc.model.word_index[';']
+    ranks = range(len(words))
+    sentences = []
+    for _ in range(num_sentences):
+        sentence = []
+        while len(sentence) < sentence_words:
+            rank = rng.choices(ranks, cum_weights=vlc.model.upper)[0]
+            if rank != end:
+                sentence.append(words[rank])
+        sentences.append(' '.join(sentence))
+    return sentences
+
+def read_corpus(path):
+    # The lines of path, lowercased, without the words the model doesn't have.
+    # Returns (sentences, number of words skipped).
+    index = vlc.model.word_index
+    sentences = []
+    skipped = 0
+    with open(path) as f:
+        for line in f:
+            words = line.lower().split()
+            kept = [word for word in words if word != ';' and word in index]
+            skipped += len(words) - len(kept)
+            if kept:
+                sentences.append(' '.join(kept))
+    return sentences, skipped
+
+def bench_load(repeat):
+    results = {'import_seconds': IMPORT_SECONDS,
+               'compiled_model': vlc.model.path is not None}
+    if vlc.model.path is not None:
+        results['load_model_seconds'] = best_time(vlc.load_model, repeat)
+    else:
+        results['build_model_seconds'] = best_time(vlc.build_model, 1)
+    return results
+
+def bench_words(sentences, repeat):
+    # encode_word and decode_bits, the interval codec one word at a time.
+    words = [word for sentence in sentences for word in sentence.split()]
+    bits = [''.join(vlc.encode_word(word) for word in sentence.split())
+            for sentence in sentences]
+    def encode_words():
+        for word in words:
+            vlc.encode_word(word)
+    def decode_sentences():
+        for sentence_bits in bits:
+            vlc.decode_bits(sentence_bits)
+    encode_seconds = best_time(encode_words, repeat)
+    decode_seconds = best_time(decode_sentences, repeat)
+    return {'codebook': vlc.codebook is not None,
+            'encode_word_words_per_second': len(words) / encode_seconds,
+            'decode_bits_words_per_second': len(words) / decode_seconds}
+
+def check_codebook(sentences):
+    # If word_freqs.codebook is up to date, encode (through encode_word and
+    # word_code) has to be using it, since it's loaded at import, and its codes
+    # have to match the ones encode_word finds by searching. Returns a list of
+    # the problems.
+    if vlc.read_codebook() is None:
+        return []
+    if vlc.codebook is None:
+        return [f'{vlc.CODEBOOK_FILE} is up to date but encode_word is not using it']
+    problems = []
+    book = vlc.codebook
+    for word in sorted({word for sentence in sentences for word in sentence.split()}):
+        cached = vlc.encode_word(word)
+        vlc.codebook = None
+        try:
+            searched = vlc.encode_word(word)
+        finally:
+            vlc.codebook = book
+        if cached != searched:
+            problems.append(f'"{word}": codebook gives {cached}, search gives {searched}')
+    return problems
+
+def bench_codec(sentences, codec, repeat):
+    num_words = sum(len(sentence.split()) for sentence in sentences)
+    start = time.perf_counter()
+    # The first use builds the codec's tables.
+    vlc.decode_bytes(vlc.encode_bytes('', codec), codec)
+    warmup_seconds = time.perf_counter() - start
+    num_bits = 0
+    for sentence in sentences:
+        writer = vlc.BitWriter(8)
+        vlc.encode_bits(sentence.split(), codec, writer)
+        num_bits += writer.bits
+    encoded = [vlc.encode(sentence, codec) for sentence in sentences]
+    encoded_words = sum(len(sentence.split()) for sentence in encoded)
+    encode_seconds = best_time(lambda: [vlc.encode(sentence, codec) for sentence in sentences], repeat)
+    decode_seconds = best_time(lambda: [vlc.decode(sentence, codec) for sentence in encoded], repeat)
+    return {'warmup_seconds': warmup_seconds,
+            'encode_words_per_second': num_words / encode_seconds,
+            'decode_words_per_second': num_words / decode_seconds,
+            'bits_per_word': num_bits / num_words,
+            'output_words_per_word': encoded_words / num_words}
+
+def bench_stages(sentences, codec):
+    # Seconds and calls in each stage for encoding and decoding every sentence
+    # once, and the seconds that weren't in any stage.
+    encoded = [vlc.encode(sentence, codec) for sentence in sentences]
+    with vlc.profile_stages() as timer:
+        start = time.perf_counter()
+        for sentence in sentences:
+            vlc.encode(sentence, codec)
+        for sentence in encoded:
+            vlc.decode(sentence, codec)
+        total = time.perf_counter() - start
+    results = {stage: {'seconds': timer.seconds[stage], 'calls': timer.calls[stage]}
+               for stage in vlc.STAGES}
+    results['other_seconds'] = total - sum(timer.seconds.values())
+    return results
+
+def bench_memory(sentences, codecs):
+    # Peak memory allocated by Python while encoding and decoding (once the
+    # codecs' tables are built), and the process's peak resident set size
+    # (which includes the mapped model and the tables).
+    tracemalloc.start()
+    for codec in codecs:
+        for sentence in sentences:
+            vlc.decode(vlc.encode(sentence, codec), codec)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'peak_traced_bytes': peak,
+            'max_rss_kilobytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def run(corpus=None, repeat=3, stages=False):
+    results = {'corpus': corpus}
+    if corpus is None:
+        sentences = sample_corpus()
+        results['skipped_words'] = 0
+    else:
+        sentences, results['skipped_words'] = read_corpus(corpus)
+    results['sentences'] = len(sentences)
+    results['words'] = sum(len(sentence.split()) for sentence in sentences)
+    results['load'] = bench_load(repeat)
+    results['word'] = bench_words(sentences, repeat)
+    results['codebook_problems'] = check_codebook(sentences)
+    codecs = []
+    results['codecs'] = {}
+    for codec in vlc.CODECS:
+        try:
+            results['codecs'][codec] = bench_codec(sentences, codec, repeat)
+        except ValueError:
+            continue # the bigram codec, without a trained Bigram
+        codecs.append(codec)
+    if stages:
+        results['stages'] = {codec: bench_stages(sentences, codec) for codec in codecs}
+    results['memory'] = bench_memory(sentences, codecs)
+    return results
+
+def print_results(results):
+    print(f"{results['sentences']} sentences, {results['words']} words"
+          f" ({results['skipped_words']} skipped)")
+    for name, value in results['load'].items():
+        print(f'{name}: {value:.4g}' if isinstance(value, float) else f'{name}: {value}')
+    for name, value in results['word'].items():
+        print(f'{name}: {value:.0f}' if isinstance(value, float) else f'{name}: {value}')
+    for problem in results['codebook_problems'][:20]:
+        print(f'codebook: {problem}')
+    print(f"{'codec':>10} {'encode w/s':>12} {'decode w/s':>12} {'bits/word':>10} {'words/word':>11}")
+    for codec, r in results['codecs'].items():
+        print(f"{codec:>10} {r['encode_words_per_second']:12.0f} {r['decode_words_per_second']:12.0f}"
+              f" {r['bits_per_word']:10.3f} {r['output_words_per_word']:11.3f}")
+    for codec, r in results.get('stages', {}).items():
+        times = ', '.join(f"{stage} {r[stage]['seconds']:.3f}s" for stage in vlc.STAGES)
+        print(f"{codec} stages: {times}, other {r['other_seconds']:.3f}s")
+    for name, value in results['memory'].items():
+        print(f'{name}: {value}')
+
+if __name__ == '__main__':
+    corpus = None
+    output = None
+    repeat = 3
+    stages = False
+    for arg in sys.argv[1:]:
+        if arg.startswith('--output='):
+            output = arg[len('--output='):]
+        elif arg.startswith('--repeat='):
+            repeat = int(arg[len('--repeat='):])
+        elif arg == '--stages':
+            stages = True
+        else:
+            corpus = arg
+    results = run(corpus, repeat, stages)
+    print_results(results)
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+    if results['codebook_problems']:
+        sys.exit(1)